@@ -0,0 +1,4 @@
+"""Synthetic-scale benchmarks for the data layer behind the sourcing form.
+
+Run ``python -m benchmarks.run --help`` from the repository root.
+"""
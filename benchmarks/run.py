@@ -0,0 +1,306 @@
+"""Time the data paths of the sourcing form on synthetic catalogs.
+
+Every size gets a fresh working directory with a generated catalog, sourcing
+map and log history. The timed operations are the ones behind the app's
+``load_sku_data`` (from snapshots and from JSON), single-product lookups,
+category and search filters, ``save_sourcing_data`` and ``add_supplier``,
+``add_log``, the procurement planner, the price history, the export loop and
+the log filters; they call the same storage, index and export modules the
+app uses, without Streamlit.
+
+Results are written as JSON together with the git commit, so two runs can be
+compared with ``--compare``::
+
+    python -m benchmarks.run --sizes 1000 10000 --output before.json
+    python -m benchmarks.run --sizes 1000 10000 --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks import synthetic
+from sourcing_core import activity_log, export
+from sourcing_core.catalog_index import CatalogIndex
+from sourcing_core.columnar import ProductColumns, TierColumns
+from sourcing_core.data_cache import DataCache
+from sourcing_core.log_query import LogIndex
+from sourcing_core.planner import plan_orders
+from sourcing_core.price_history import PRICE_HISTORY_DIR, PriceHistory, seed_from_sourcing
+from sourcing_core.quote_engine import QuoteBook
+from sourcing_core.storage import (DB_FILE, SKU_FILE, SOURCING_FILE, JsonStorage, SqliteStorage,
+                                   migrate_json_to_sqlite)
+
+DEFAULT_SIZES = [1000, 10000]
+SEARCH_QUERIES = ['marlboro', 'gold flake lighter', 'marlbro', 'smok', 'rolling papers 12']
+# Demand lines given to the procurement planner
+PLAN_LINES = 1000
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def git_commit():
+    """Return the current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn, repeat):
+    """Run ``fn`` ``repeat`` times; returns (timings in seconds, last result)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+class Recorder:
+    """Collects timings for one size and backend"""
+
+    def __init__(self, size, backend, repeat, results):
+        self.size = size
+        self.backend = backend
+        self.repeat = repeat
+        self.results = results
+
+    def time(self, name, fn, repeat=None, per_call=1):
+        timings, result = measure(fn, repeat or self.repeat)
+        timings = [t / per_call for t in timings]
+        self.results.append({
+            'size': self.size,
+            'backend': self.backend,
+            'name': name,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'runs': len(timings),
+        })
+        print(f"{self.size:>8} {self.backend:<7} {name:<28} {min(timings) * 1000:10.2f} ms")
+        return result
+
+    def value(self, name, value, unit):
+        self.results.append({'size': self.size, 'backend': self.backend, 'name': name,
+                             'value': value, 'unit': unit})
+        print(f"{self.size:>8} {self.backend:<7} {name:<28} {value:10.2f} {unit}")
+
+
+def _export(rows, fmt):
+    path, count = export.export_rows(rows, export.SOURCING_COLUMNS, fmt)
+    os.remove(path)
+    return count
+
+
+def bench_storage(rec, storage, formats):
+    """Load, filter, save and export through one storage backend"""
+    cache = DataCache()
+    products = rec.time('load_sku_data', storage.load_products)
+    rec.time('load_sku_data_cached',
+             lambda: cache.get('products', storage.version('products'), storage.load_products))
+    sourcing_data = rec.time('load_sourcing_data', storage.load_sourcing)
+    if isinstance(storage, JsonStorage):
+        # The loads above read the binary snapshots; these parse the JSON itself
+        plain = JsonStorage(storage.sku_path, storage.sourcing_path, snapshots=False)
+        rec.time('load_sku_data_json', plain.load_products, repeat=1)
+        rec.time('load_sourcing_data_json', plain.load_sourcing, repeat=1)
+    lookups = [product['product_index'] for product in products[::max(len(products) // 20, 1)]]
+    rec.time('get_product', lambda: [storage.get_product(i) for i in lookups], per_call=len(lookups))
+    rec.time('suppliers_for', lambda: [storage.suppliers_for(i) for i in lookups], per_call=len(lookups))
+
+    index = rec.time('build_catalog_index', lambda: CatalogIndex(products, sourcing_data))
+    rec.time('category_filter', lambda: [index.products_in(c) for c in index.categories],
+             per_call=max(len(index.categories), 1))
+    rec.time('build_search_index', lambda: CatalogIndex(products, sourcing_data).search, repeat=1)
+    rec.time('search', lambda: [index.search.search(q) for q in SEARCH_QUERIES],
+             per_call=len(SEARCH_QUERIES))
+    rec.time('autocomplete', lambda: [index.search.autocomplete(q[:4]) for q in SEARCH_QUERIES],
+             per_call=len(SEARCH_QUERIES))
+
+    product_columns = rec.time('build_product_columns', lambda: ProductColumns(products), repeat=1)
+    tier_columns = rec.time('build_tier_columns', lambda: TierColumns(sourcing_data), repeat=1)
+    rec.value('tier_columns_mb', tier_columns.nbytes / 1e6, 'MB')
+    rec.time('columnar_category_filter',
+             lambda: [product_columns.in_category(c) for c in index.categories],
+             per_call=max(len(index.categories), 1))
+    rec.time('columnar_price_filter', lambda: product_columns.price_between(100, 500))
+    rec.time('build_quote_book', lambda: QuoteBook(tier_columns), repeat=1)
+    demand = synthetic.make_demand(PLAN_LINES, products)
+    rec.time(f'plan_orders_{PLAN_LINES}', lambda: plan_orders(demand, tier_columns, index.by_id), repeat=1)
+
+    supplier = {"supplier_name": "Benchmark Supplier", "contact_info": "bench",
+                "delivery_time": 3, "moq": 1, "quantity_pricing": {"1+": 10.0, "10+": 9.0},
+                "added_date": datetime.now().isoformat()}
+    rec.time('add_supplier', lambda: storage.add_supplier(products[0]['product_index'], dict(supplier)))
+    rec.time('save_sourcing_data', lambda: storage.save_sourcing(sourcing_data))
+
+    for fmt in formats:
+        rec.time(f'export_{fmt}', lambda: _export(storage.iter_tier_rows(), fmt), repeat=1)
+        rec.time(f'export_{fmt}_columnar', lambda: _export(tier_columns.rows(index.by_id), fmt), repeat=1)
+
+
+def bench_logs(rec, log_dir, appends):
+    """Append to and filter a large log history"""
+    entry = {"timestamp": datetime.now().isoformat(), "action": "Supplier Added",
+             "details": "Benchmark entry", "product_name": "Benchmark", "supplier_name": "Bench"}
+    rec.time('add_log', lambda: [activity_log.append_entry(dict(entry), log_dir=log_dir, compress=True)
+                                 for _ in range(appends)], repeat=1, per_call=appends)
+    rec.time('read_recent_1000', lambda: activity_log.read_recent(1000, log_dir=log_dir))
+    index = rec.time('build_log_index', lambda: LogIndex(activity_log.read_window(log_dir=log_dir)), repeat=1)
+    today = date.today()
+    rec.time('log_filter_last_7_days', lambda: len(index.query(start=today - timedelta(days=7))))
+    rec.time('log_filter_action', lambda: len(index.query(action='Bulk Import')))
+    rec.time('log_filter_text', lambda: len(index.query(text='marlboro')))
+    rec.time('log_filter_combined',
+             lambda: len(index.query(action='Supplier Added', start=today - timedelta(days=30), text='gold')))
+
+
+def bench_price_history(rec, history_dir, products, sourcing_data):
+    """Seed a price history, append single revisions and run its queries"""
+    history = PriceHistory(history_dir)
+    rec.time('price_history_seed', lambda: seed_from_sourcing(history, sourcing_data), repeat=1)
+    product_index = products[0]['product_index']
+    # A supplier appended after the product's existing ones
+    position = len(sourcing_data.get(str(product_index), []))
+    price = [100.0]
+
+    def revise():
+        price[0] += 1
+        return history.record(product_index, position, 'Benchmark Supplier', {'1+': price[0]})
+    rec.time('price_history_append', revise)
+    rec.time('price_history_latest', lambda: history.latest(product_index))
+    since = datetime.now() - timedelta(days=30)
+    rec.time('price_history_range_30d', lambda: history.price_range(start=since))
+    categories = {p['product_index']: p.get('category_name', '') for p in products}
+    rec.time('price_history_trend', lambda: history.category_trend(categories.get, start=since))
+
+
+def bench_cold_start(repeat, results):
+    """Time fresh interpreters importing the app's data layer and running the CLI"""
+    rec = Recorder(0, 'startup', repeat, results)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run(*command):
+        subprocess.run([sys.executable, *command], cwd=root, check=True, capture_output=True)
+
+    rec.time('python_baseline', lambda: run('-c', 'pass'))
+    rec.time('import_core', lambda: run('-c', 'from sourcing_core import activity_log, export, catalog_index, '
+                                        'log_query, storage'))
+    rec.time('cli_help', lambda: run('-m', 'sourcing_core', '--help'))
+
+
+def scratch_path(workdir, name):
+    """Return ``name`` inside the benchmark's working directory
+
+    Raises RuntimeError if that is one of the app's own data files or
+    directories in the current directory: the benchmark rewrites them and
+    finally deletes the whole working directory.
+    """
+    path = os.path.realpath(os.path.join(workdir, name))
+    own = [SKU_FILE, SOURCING_FILE, DB_FILE, PRICE_HISTORY_DIR,
+           activity_log.LOG_DIR, activity_log.legacy_log_path()]
+    if path in {os.path.realpath(own_path) for own_path in own}:
+        raise RuntimeError(f"Refusing to benchmark against the app's own data at {path}")
+    return path
+
+
+def run_size(size, args, results):
+    workdir = tempfile.mkdtemp(prefix=f'sourcing_bench_{size}_')
+    try:
+        start = time.perf_counter()
+        products = synthetic.make_products(size, seed=args.seed)
+        sourcing_data = synthetic.make_sourcing(products, max_suppliers=args.max_suppliers, seed=args.seed)
+        sku_path = scratch_path(workdir, 'final_sku.json')
+        sourcing_path = scratch_path(workdir, 'sourcing_data.json')
+        synthetic.write_catalog(products, sku_path)
+        synthetic.write_sourcing(sourcing_data, sourcing_path)
+        supplier_count = sum(len(suppliers) for suppliers in sourcing_data.values())
+        print(f"# {size} products, {supplier_count} suppliers generated in "
+              f"{time.perf_counter() - start:.1f} s")
+        bench_price_history(Recorder(size, 'history', args.repeat, results),
+                            scratch_path(workdir, 'price_history'), products, sourcing_data)
+        del sourcing_data
+
+        for backend in args.backends:
+            rec = Recorder(size, backend, args.repeat, results)
+            if backend == 'sqlite':
+                db_path = scratch_path(workdir, 'sourcing.db')
+                rec.time('migrate_json_to_sqlite',
+                         lambda: migrate_json_to_sqlite(db_path, sku_path, sourcing_path), repeat=1)
+                storage = SqliteStorage(db_path)
+            else:
+                storage = JsonStorage(sku_path, sourcing_path)
+            bench_storage(rec, storage, args.formats)
+
+        # Never the app's LOG_DIR, so appends and reads leave app_logs.json alone
+        log_dir = scratch_path(workdir, 'app_logs')
+        synthetic.write_log_history(synthetic.make_log_entries(args.log_entries, products, seed=args.seed), log_dir)
+        bench_logs(Recorder(size, 'logs', args.repeat, results), log_dir, args.log_appends)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results, baseline_path):
+    """Print the ratio of each median to the same benchmark in a previous run"""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    previous = {(r['size'], r['backend'], r['name']): r['median']
+                for r in baseline['results'] if 'median' in r}
+    print(f"\n# compared with {baseline.get('commit') or baseline_path}")
+    for r in results:
+        before = previous.get((r['size'], r['backend'], r['name'])) if 'median' in r else None
+        if before:
+            print(f"{r['size']:>8} {r['backend']:<7} {r['name']:<28} {r['median'] / before:8.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sourcing data layer on synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="catalog sizes to generate, e.g. 1000 10000 100000")
+    parser.add_argument('--max-suppliers', type=int, default=50, help="suppliers per product are 1..N")
+    parser.add_argument('--backends', nargs='+', choices=['json', 'sqlite'], default=['json', 'sqlite'])
+    parser.add_argument('--formats', nargs='+', choices=list(export.WRITERS), default=['csv'])
+    parser.add_argument('--log-entries', type=int, default=200000, help="size of the synthetic log history")
+    parser.add_argument('--log-appends', type=int, default=200, help="add_log calls to time")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    results = []
+    bench_cold_start(args.repeat, results)
+    for size in args.sizes:
+        run_size(size, args, results)
+
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'arguments': vars(args),
+        'results': results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{(commit or 'nocommit')[:12]}.json")
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Deterministic synthetic catalogs, sourcing maps and log histories.
+
+The generated records have the same shape as ``final_sku.json``,
+``sourcing_data.json`` and the activity log, so they can be written with the
+real storage backends and read back through the same code paths as the app.
+"""
+
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from sourcing_core import activity_log
+
+BRANDS = ['Marlboro', 'Gold Flake', 'Classic', 'Stash-Pro', 'Zippo', 'Rizla', 'Raw', 'Bic',
+          'Smoke Pro', 'Navy Cut', 'Wills', 'Benson', 'Camel', 'Davidoff', 'Lucky']
+NOUNS = ['Compact Pack', 'Rolling Papers', 'Windproof Lighter', 'Filter Tips', 'Ashtray',
+         'King Size', 'Slim Pack', 'Grinder', 'Cones', 'Refill Gas', 'Case', 'Tray']
+VARIANTS = ['Advanced', 'Mint', 'Classic', 'Lite', 'Assorted', 'Blue', 'Red', 'Black', 'Gold']
+WEIGHTS = ['10 cigarettes', '20 cigarettes', '1 piece', '32 leaves', '50 tips', '100 g']
+TIER_LABELS = ['1+', '10+', '50+']
+LOG_ACTIONS = ['Product Added', 'Supplier Added', 'Bulk Import', 'Export']
+
+
+def make_products(count, categories=40, seed=0):
+    """Return ``count`` products spread over ``categories`` category names"""
+    rng = random.Random(seed)
+    category_names = [f"Category {i:03d}" for i in range(categories)]
+    products = []
+    for product_index in range(1, count + 1):
+        brand = rng.choice(BRANDS)
+        name = f"{brand} {rng.choice(VARIANTS)} {rng.choice(NOUNS)} {product_index}"
+        products.append({
+            "product_index": product_index,
+            "product_name": name,
+            "price_numeric": rng.randint(10, 2000),
+            "weight_quantity": rng.choice(WEIGHTS),
+            "description": f"{name} from {brand}",
+            "category_name": rng.choice(category_names),
+        })
+    return products
+
+
+def make_sourcing(products, min_suppliers=1, max_suppliers=50, seed=0):
+    """Return a sourcing map with 1-50 suppliers and three price tiers per product"""
+    rng = random.Random(seed)
+    added = datetime(2025, 1, 1)
+    sourcing_data = {}
+    for product in products:
+        list_price = product['price_numeric']
+        suppliers = []
+        for number in range(rng.randint(min_suppliers, max_suppliers)):
+            price = round(list_price * rng.uniform(0.5, 0.9), 2)
+            suppliers.append({
+                "supplier_name": f"Supplier {rng.randint(1, 5000):04d}",
+                "contact_info": f"+91 9{rng.randint(100000000, 999999999)}",
+                "delivery_time": rng.randint(1, 30),
+                "moq": rng.choice([1, 1, 5, 10, 25]),
+                "quantity_pricing": {
+                    label: round(price * factor, 2)
+                    for label, factor in zip(TIER_LABELS, (1.0, 0.95, 0.9))
+                },
+                "added_date": (added + timedelta(minutes=number)).isoformat(),
+            })
+        sourcing_data[str(product['product_index'])] = suppliers
+    return sourcing_data
+
+
+def make_log_entries(count, products, days=365, seed=0):
+    """Return ``count`` log entries in time order spread over the last ``days`` days"""
+    rng = random.Random(seed)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = (end - start) / max(count, 1)
+    entries = []
+    for i in range(count):
+        product = rng.choice(products)
+        action = rng.choice(LOG_ACTIONS)
+        supplier = f"Supplier {rng.randint(1, 5000):04d}"
+        entries.append({
+            "timestamp": (start + step * i).isoformat(),
+            "action": action,
+            "details": f"{action} for product '{product['product_name']}'",
+            "product_name": product['product_name'],
+            "supplier_name": supplier if action == 'Supplier Added' else None,
+        })
+    return entries
+
+
+def make_demand(count, products, max_quantity=2000, seed=0):
+    """Return ``count`` demand lines, most with a deadline in the next 3 weeks"""
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    return [{
+        "product_index": rng.choice(products)['product_index'],
+        "quantity": rng.randint(1, max_quantity),
+        "deadline": today + timedelta(days=rng.randint(1, 21)) if rng.random() < 0.7 else None,
+    } for _ in range(count)]
+
+
+def write_catalog(products, path):
+    """Write products in the ``final_sku.json`` layout"""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({"metadata": {"total_products": len(products)}, "products": products},
+                  file, indent=2, ensure_ascii=False)
+
+
+def write_sourcing(sourcing_data, path):
+    """Write a sourcing map in the ``sourcing_data.json`` layout"""
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({"metadata": {}, "sourcing": sourcing_data}, file, indent=2, ensure_ascii=False)
+
+
+def write_log_history(entries, log_dir, max_segment_bytes=activity_log.MAX_SEGMENT_BYTES):
+    """Write entries as activity log segments, rotating like ``append_entry`` does"""
+    os.makedirs(log_dir, exist_ok=True)
+    number, size = 1, 0
+    file = open(os.path.join(log_dir, activity_log._segment_name(number)), 'w', encoding='utf-8')
+    try:
+        for entry in entries:
+            line = json.dumps(entry, ensure_ascii=False) + '\n'
+            file.write(line)
+            size += len(line.encode('utf-8'))
+            if size >= max_segment_bytes:
+                file.close()
+                number, size = number + 1, 0
+                file = open(os.path.join(log_dir, activity_log._segment_name(number)), 'w', encoding='utf-8')
+    finally:
+        file.close()
+    return number
@@ -0,0 +1,72 @@
+"""Paged rendering for the long lists in the Streamlit UI.
+
+``paginate`` draws previous/next controls and a page-size picker, keeps the
+cursor in ``st.session_state`` so it survives reruns, and returns only the
+slice of records on the current page. Callers render just that slice, so a
+page costs the same whether ten or a hundred thousand records matched.
+"""
+
+import math
+
+import streamlit as st
+
+PAGE_SIZES = [10, 25, 50, 100]
+DEFAULT_PAGE_SIZE = 25
+
+
+def page_bounds(total, page, page_size):
+    """Clamp ``page`` and return (page, page_count, start, stop)"""
+    page_count = max(1, math.ceil(total / page_size))
+    page = min(max(page, 0), page_count - 1)
+    start = page * page_size
+    return page, page_count, start, min(start + page_size, total)
+
+
+def _move(state_key, step):
+    st.session_state[state_key] = st.session_state.get(state_key, 0) + step
+
+
+def _reset(state_key):
+    st.session_state[state_key] = 0
+
+
+def paginate(items, key, page_size=DEFAULT_PAGE_SIZE, reset_on=None, reverse=False):
+    """Render page controls for ``items`` and return the visible slice
+
+    ``key`` namespaces the session state of this list. The cursor goes back
+    to the first page whenever ``reset_on`` (typically the active filters)
+    changes. With ``reverse=True`` the last item is shown first, without
+    copying the list.
+    """
+    page_key = f"{key}_page"
+    size_key = f"{key}_page_size"
+    filter_key = f"{key}_page_filter"
+
+    if st.session_state.get(filter_key) != reset_on:
+        st.session_state[filter_key] = reset_on
+        st.session_state[page_key] = 0
+
+    total = len(items)
+    if size_key not in st.session_state:
+        st.session_state[size_key] = page_size
+    size = st.session_state[size_key]
+    page, page_count, start, stop = page_bounds(total, st.session_state.get(page_key, 0), size)
+    st.session_state[page_key] = page
+
+    if total > min(PAGE_SIZES):
+        col1, col2, col3, col4 = st.columns([1, 3, 1, 2])
+        with col1:
+            st.button("◀ Prev", key=f"{key}_prev", disabled=page == 0,
+                      on_click=_move, args=(page_key, -1))
+        with col2:
+            st.caption(f"Page {page + 1} of {page_count} · showing {start + 1}-{stop} of {total}")
+        with col3:
+            st.button("Next ▶", key=f"{key}_next", disabled=page >= page_count - 1,
+                      on_click=_move, args=(page_key, 1))
+        with col4:
+            st.selectbox("Per page", PAGE_SIZES, key=size_key, label_visibility="collapsed",
+                         on_change=_reset, args=(page_key,))
+
+    if reverse:
+        return items[total - stop:total - start][::-1]
+    return items[start:stop]
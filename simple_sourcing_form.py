@@ -1,9 +1,17 @@
 import streamlit as st
-import json
-import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 
+from pagination import paginate
+from sourcing_core import activity_log, export, instrumentation
+from sourcing_core.catalog_index import CatalogIndex
+from sourcing_core.data_cache import cache
+from sourcing_core.jobs import DONE, FAILED, export_job, get_runner
+from sourcing_core.log_query import LogIndex
+from sourcing_core.price_history import PriceHistory, seed_from_sourcing
+from sourcing_core.storage import DEFAULT_CATEGORY, get_storage
+from sourcing_core.write_coordination import VersionConflict
+
 # Page configuration
 st.set_page_config(
     page_title="Simple SKU Sourcing",
@@ -38,114 +46,636 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+# Gzip closed log segments when the active one rotates
+ARCHIVE_LOG_SEGMENTS = True
+
+# Order quantities quoted by default in the best-price views
+DEFAULT_QUOTE_QUANTITIES = "1, 10, 50, 100, 500"
+# Seconds between status checks while a background job runs
+JOB_POLL_SECONDS = 1.0
+# Show the diagnostics tab to everyone; otherwise only with ?diagnostics=1 in the URL
+SHOW_DIAGNOSTICS = os.environ.get('SOURCING_DIAGNOSTICS') == '1'
+
+# JSON files or SQLite, chosen with the SKU_STORAGE_BACKEND environment variable
+storage = get_storage()
+# Append-only record of every supplier price change
+price_history = PriceHistory()
+# Exports, plans, trends and log compaction run here, shared by every session
+jobs = get_runner()
+
 def load_sku_data():
-    """Load SKU data from JSON file"""
+    """Load SKU data, reusing the parsed catalog until it changes on disk"""
     try:
-        with open('final_sku.json', 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        return data['products']
+        return cache.get('products', storage.version('products'), storage.load_products)
     except Exception as e:
         st.error(f"Error loading SKU data: {e}")
         return []
 
-def save_sku_data(products):
-    """Save SKU data to JSON file"""
+def add_product(product, index):
+    """Add a single product and update the cached catalog in place"""
     try:
-        data = {
-            "metadata": {
-                "updated_timestamp": datetime.now().isoformat(),
-                "total_products": len(products)
-            },
-            "products": products
-        }
-        with open('final_sku.json', 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=2, ensure_ascii=False)
+        # The cached values are only advanced if they were built from the
+        # version this write starts from
+        products_version, index_version = storage.version('products'), catalog_version()
+        with instrumentation.span('save.product'):
+            storage.add_product(product)
+            index.add_product(product)
+        cache.update('products', index.products, storage.version('products'), products_version)
+        cache.update('catalog', index, catalog_version(), index_version)
         return True
     except Exception as e:
         st.error(f"Error saving data: {e}")
         return False
 
 def load_sourcing_data():
-    """Load sourcing data"""
+    """Load sourcing data, reusing the parsed map until it changes on disk"""
     try:
-        if os.path.exists('sourcing_data.json'):
-            with open('sourcing_data.json', 'r', encoding='utf-8') as file:
-                return json.load(file)
+        return cache.get('sourcing', storage.version('sourcing'), storage.load_sourcing)
     except Exception as e:
         st.warning(f"Could not load sourcing data: {e}")
     return {}
 
-def save_sourcing_data(data):
-    """Save sourcing data"""
+def add_supplier(product_index, supplier, index):
+    """Add a single supplier record and update the cached sourcing map in place"""
+    try:
+        sourcing_version, index_version = storage.version('sourcing'), catalog_version()
+        with instrumentation.span('save.supplier'):
+            position = storage.add_supplier(product_index, supplier)
+            index.add_supplier(product_index, supplier)
+        cache.update('sourcing', index.sourcing, storage.version('sourcing'), sourcing_version)
+        cache.update('catalog', index, catalog_version(), index_version)
+        record_prices([(product_index, position, supplier.get('supplier_name', ''),
+                        supplier.get('quantity_pricing'), supplier.get('added_date'))])
+        return True
+    except Exception as e:
+        st.error(f"Error saving sourcing data: {e}")
+        return False
+
+def add_suppliers(batch, index):
+    """Add a batch of (product_index, supplier) pairs in one storage write"""
     try:
-        with open('sourcing_data.json', 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=2, ensure_ascii=False)
+        sourcing_version, index_version = storage.version('sourcing'), catalog_version()
+        with instrumentation.span('save.suppliers', count=len(batch)):
+            positions = storage.add_suppliers(batch)
+            index.add_suppliers(batch)
+        cache.update('sourcing', index.sourcing, storage.version('sourcing'), sourcing_version)
+        cache.update('catalog', index, catalog_version(), index_version)
+        record_prices([(product_index, position, supplier.get('supplier_name', ''),
+                        supplier.get('quantity_pricing'), supplier.get('added_date'))
+                       for (product_index, supplier), position in zip(batch, positions)])
         return True
     except Exception as e:
         st.error(f"Error saving sourcing data: {e}")
         return False
 
+def update_supplier_prices(product_index, position, supplier, pricing):
+    """Replace one supplier's tier prices and record the change in the price history"""
+    name = supplier.get('supplier_name', '')
+    try:
+        with instrumentation.span('save.prices'):
+            storage.update_pricing(product_index, position, name, pricing)
+        cache.invalidate('sourcing', 'catalog')
+    except VersionConflict:
+        cache.invalidate('sourcing', 'catalog')
+        st.warning("Sourcing data was changed by another user. Reload and apply your edit again.")
+        return False
+    except Exception as e:
+        st.error(f"Error saving sourcing data: {e}")
+        return False
+    # The quoted prices go in first, so suppliers added before the history
+    # existed keep their original quote as the previous revision
+    record_prices([(product_index, position, name, supplier.get('quantity_pricing'), supplier.get('added_date')),
+                   (product_index, position, name, pricing, None)])
+    return True
+
+def record_prices(revisions):
+    """Append (product_index, position, supplier_name, pricing, timestamp) revisions to the price history"""
+    try:
+        price_history.record_many(revisions)
+        return True
+    except Exception as e:
+        st.warning(f"Could not record price history: {e}")
+        return False
+
+def catalog_version():
+    """Return the combined data version the catalog index is built from"""
+    return (storage.version('products'), storage.version('sourcing'))
+
+def load_catalog_index():
+    """Load the catalog index, rebuilt only when products or sourcing data change"""
+    try:
+        with instrumentation.span('load.catalog'):
+            return cache.get('catalog', catalog_version(),
+                             lambda: CatalogIndex(load_sku_data(), load_sourcing_data()))
+    except Exception as e:
+        st.error(f"Error building catalog index: {e}")
+        return CatalogIndex([], {})
+
 def add_log(action, details, product_name=None, supplier_name=None):
     """Add a log entry"""
     try:
-        if os.path.exists('app_logs.json'):
-            with open('app_logs.json', 'r', encoding='utf-8') as file:
-                logs = json.load(file)
-        else:
-            logs = []
-        
+        # Stamped by append_entry under the append lock, so entries stay in order
         log_entry = {
-            "timestamp": datetime.now().isoformat(),
             "action": action,
             "details": details,
             "product_name": product_name,
             "supplier_name": supplier_name
         }
         
-        logs.append(log_entry)
-        
-        # Keep only last 1000 logs
-        if len(logs) > 1000:
-            logs = logs[-1000:]
-        
-        with open('app_logs.json', 'w', encoding='utf-8') as file:
-            json.dump(logs, file, indent=2, ensure_ascii=False)
-        
+        # One JSON line per entry; old segments are kept rather than truncated
+        with instrumentation.span('save.log'):
+            activity_log.append_entry(log_entry, compress=ARCHIVE_LOG_SEGMENTS)
         return True
     except Exception as e:
         st.error(f"Error adding log: {e}")
         return False
 
-def load_logs():
-    """Load application logs"""
+def load_log_index():
+    """Load the log query index over the full history
+    
+    When new entries have been appended, only the entries since the last
+    indexed timestamp are read and added.
+    """
+    def catch_up(index):
+        index.extend(activity_log.read_window(index.last_timestamp))
+        return index
+    
     try:
-        if os.path.exists('app_logs.json'):
-            with open('app_logs.json', 'r', encoding='utf-8') as file:
-                return json.load(file)
+        with instrumentation.span('load.logs'):
+            return cache.get('log_index', activity_log.signature(),
+                             lambda: LogIndex(activity_log.read_window()), refresh=catch_up)
     except Exception as e:
         st.warning(f"Could not load logs: {e}")
-    return []
+    return LogIndex()
+
+def show_cache_stats():
+    """Show per-dataset cache hit/miss counters in the sidebar"""
+    with st.sidebar.expander("🗃️ Cache Statistics", expanded=False):
+        stats = cache.stats()
+        if not stats:
+            st.caption("Nothing cached yet")
+        for key, counters in sorted(stats.items()):
+            st.caption(f"**{key}**: {counters['hits']} hits, {counters['misses']} misses, "
+                       f"{counters['invalidations']} invalidations")
+
+def diagnostics_panel():
+    """Show rerun timings, I/O counters and cache hit rates for operators"""
+    st.markdown("## 🩺 Diagnostics")
+    if not instrumentation.ENABLED:
+        st.info("Instrumentation is disabled (SOURCING_INSTRUMENTATION=0)")
+        return
+    
+    # Background jobs record runs of their own, listed under Background Jobs
+    runs = [run for run in instrumentation.recent_runs() if run['label'] == 'rerun']
+    if runs:
+        last = runs[-1]
+        durations = [run['duration_ms'] for run in runs]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Last rerun", f"{last['duration_ms']:.0f} ms")
+        col2.metric(f"Mean of last {len(runs)} reruns", f"{sum(durations) / len(durations):.0f} ms")
+        col3.metric("Slowest recent rerun", f"{max(durations):.0f} ms")
+        
+        st.markdown("### ⏱️ Last Rerun")
+        st.dataframe([
+            {"Phase": "· " * span['depth'] + span['name'],
+             "Start (ms)": round(span['offset_ms'], 1),
+             "Duration (ms)": round(span['duration_ms'], 2)}
+            for span in sorted(last['spans'], key=lambda span: span['offset_ms'])
+        ], hide_index=True)
+    else:
+        st.caption("No completed reruns recorded yet")
+    
+    st.markdown("### 📈 Phase Totals")
+    totals = instrumentation.totals()
+    st.dataframe([
+        {"Phase": name, "Calls": total['count'],
+         "Mean (ms)": round(total['total_ms'] / total['count'], 2),
+         "Max (ms)": round(total['max_ms'], 2), "Total (ms)": round(total['total_ms'], 1)}
+        for name, total in sorted(totals.items(), key=lambda item: -item[1]['total_ms'])
+    ], hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("### 💾 File I/O")
+        for counter, count in sorted(instrumentation.byte_counters().items()):
+            st.write(f"**{counter}**: {count / 1024:,.1f} KiB")
+    with col2:
+        st.markdown("### 🗃️ Cache Hit Rates")
+        for key, counters in sorted(cache.stats().items()):
+            lookups = counters['hits'] + counters['misses']
+            rate = counters['hits'] / lookups * 100 if lookups else 0
+            st.write(f"**{key}**: {rate:.0f}% of {lookups} lookups")
+    
+    st.markdown("### ⚙️ Background Jobs")
+    recent_jobs = jobs.jobs()
+    if recent_jobs:
+        st.dataframe([
+            {"Job": job['job_id'], "Status": job['status'], "Progress": f"{job['progress']:.0%}",
+             "Submitted": job['submitted'],
+             "Duration (ms)": round(job['duration_ms'], 1) if job['duration_ms'] is not None else None,
+             "Error": job['error'] or ''}
+            for job in (job.as_dict() for job in reversed(recent_jobs))
+        ], hide_index=True)
+    else:
+        st.caption("No background jobs yet")
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.download_button("⬇️ Download runs (JSON lines)", instrumentation.to_jsonl(),
+                           file_name="sourcing_metrics.jsonl", mime="application/x-ndjson",
+                           key="diagnostics_download")
+    with col2:
+        if st.button("Reset counters", key="diagnostics_reset"):
+            instrumentation.reset()
+            st.rerun()
+
+def job_status(job_id, key, show_result):
+    """Show a background job's progress, then its result or error
+    
+    While the job runs its progress is redrawn every ``JOB_POLL_SECONDS``
+    in a fragment, so the rest of the page renders without waiting; the
+    whole page reruns once it finishes. Without fragments a refresh button
+    is shown instead.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return
+    fragment = getattr(st, 'fragment', None)
+    if job.active and fragment is not None:
+        @fragment(run_every=JOB_POLL_SECONDS)
+        def poll():
+            if not job.active:
+                st.rerun()
+            show_progress(job, key)
+        poll()
+    elif job.active:
+        show_progress(job, key)
+        st.button("🔄 Refresh", key=f"{key}_refresh")
+    elif job.status == DONE:
+        show_result(job.result)
+    elif job.status == FAILED:
+        st.error(f"{job.kind} failed: {job.error}")
+    else:
+        st.info(f"{job.kind} was cancelled")
+
+def show_progress(job, key):
+    """Progress bar and cancel button of a running job"""
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        st.progress(job.progress, text=job.message or f"{job.kind}: {job.status}")
+    with col2:
+        if st.button("✖️ Cancel", key=f"{key}_cancel"):
+            jobs.cancel(job.id)
+
+def remove_export(result):
+    """Delete an export file once its cached job result is dropped"""
+    if os.path.exists(result[0]):
+        os.remove(result[0])
+
+def export_panel(key, label, file_stem, columns, make_rows, sheet_title, version, total=None):
+    """Render a format picker and export button, then offer the file for download
+    
+    ``make_rows`` returns a fresh row generator; rows are streamed into a
+    temporary file by a background job. ``version`` identifies the data
+    (and filters) being exported, so exporting it again reuses the file;
+    ``total`` is the expected row count, or a function returning it, for
+    the progress bar.
+    """
+    state_key = f"{key}_export"
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        fmt = st.selectbox("Format:", export.available_formats(), key=f"{key}_format")
+    with col2:
+        st.write("")
+        prepare = st.button(label, key=f"{key}_button")
+    
+    if prepare:
+        if callable(total):
+            total = total()
+        job = jobs.submit(f'export.{key}', export_job, make_rows, columns, fmt, sheet_title, total,
+                          key=('export', key, fmt, version), cleanup=remove_export,
+                          valid=lambda result: os.path.exists(result[0]))
+        st.session_state[state_key] = job.id
+    
+    def show_download(result):
+        path, count, fmt = result
+        if not count:
+            st.warning("No data to export")
+        elif os.path.exists(path):
+            with open(path, 'rb') as file:
+                st.download_button(
+                    f"⬇️ Download {file_stem}.{fmt} ({count} rows)", file,
+                    file_name=f"{file_stem}.{fmt}", mime=export.MIME_TYPES[fmt], key=f"{key}_download"
+                )
+    
+    if state_key in st.session_state:
+        job_status(st.session_state[state_key], key, show_download)
+
+def compact_logs_job(context):
+    """Background job that gzips closed log segments"""
+    context.report(0, message="Compressing closed log segments")
+    with instrumentation.span('logs.compact'):
+        return activity_log.archive_old_segments()
+
+def log_compaction_panel():
+    """Offer to gzip closed log segments in the background"""
+    segments = activity_log.list_segments()
+    plain = [path for path in segments if path.endswith(activity_log.SEGMENT_SUFFIX)]
+    if len(plain) > 1 and st.button(f"🗜️ Compress {len(plain) - 1} Old Log Segments", key="compact_logs"):
+        job = jobs.submit('compact_logs', compact_logs_job, key=('compact_logs', tuple(segments)))
+        st.session_state["compact_logs_job"] = job.id
+    if "compact_logs_job" in st.session_state:
+        job_status(st.session_state["compact_logs_job"], "compact_logs_job",
+                   lambda archived: st.success(f"Compressed {len(archived)} log segments"))
+
+def parse_quantities(text):
+    """Parse a comma-separated list of order quantities"""
+    return sorted(set(int(part) for part in text.replace(' ', '').split(',') if part.isdigit() and int(part) > 0))
+
+def show_quote_table(quotes, index):
+    """Show best quotes with the product's list price and resulting margin"""
+    from sourcing_core.quote_engine import with_margins  # loads pandas on first use
+    table = with_margins(quotes, index.product_columns).rename(columns={
+        'product_index': 'Product Index',
+        'product_name': 'Product',
+        'quantity': 'Quantity',
+        'supplier_name': 'Best Supplier',
+        'tier': 'Tier',
+        'unit_price': 'Unit Price (₹)',
+        'landed_unit_price': 'Landed Unit Price (₹)',
+        'total_cost': 'Total Cost (₹)',
+        'moq': 'MOQ',
+        'delivery_time': 'Delivery (days)',
+        'price_numeric': 'List Price (₹)',
+        'margin_pct': 'Margin %',
+    })
+    st.dataframe(table, hide_index=True)
+
+def bulk_import_section(index):
+    """Upload a supplier price list, map its columns, validate and import it in one write"""
+    if "bulk_imported" in st.session_state:
+        st.success(st.session_state.pop("bulk_imported"))
+    # A new uploader key after each import clears the file, so it cannot be imported twice
+    upload_round = st.session_state.get("bulk_upload_round", 0)
+    uploaded = st.file_uploader("Price list (CSV or XLSX):", type=["csv", "xlsx"],
+                                key=f"bulk_upload_{upload_round}")
+    if uploaded is None:
+        st.caption("One row per supplier quote: product name or index, supplier name, "
+                   "optional contact, delivery time and MOQ, and up to 3 quantity slabs.")
+        return
+    
+    # pandas is only loaded once a file is uploaded
+    from sourcing_core import bulk_import
+    try:
+        df = bulk_import.read_upload(uploaded, uploaded.name)
+    except Exception as e:
+        st.error(f"Could not read {uploaded.name}: {e}")
+        return
+    
+    # Column mapping, pre-filled from recognisable headers
+    st.markdown(f"**Map columns** ({len(df)} rows in {uploaded.name})")
+    guessed = bulk_import.guess_mapping(df.columns)
+    options = ["—"] + list(df.columns)
+    mapping = {}
+    cols = st.columns(4)
+    for i, field in enumerate(bulk_import.FIELDS):
+        with cols[i % 4]:
+            default = guessed.get(field)
+            choice = st.selectbox(field, options, index=options.index(default) if default in options else 0,
+                                  key=f"bulk_map_{field}")
+            if choice != "—":
+                mapping[field] = choice
+    
+    accepted, rejected = bulk_import.validate(df, mapping, index.products)
+    col1, col2 = st.columns(2)
+    col1.metric("Valid rows", len(accepted))
+    col2.metric("Rejected rows", len(rejected))
+    
+    if len(rejected):
+        st.dataframe(rejected.head(100), hide_index=True)
+        st.download_button("⬇️ Download rejects (CSV)", rejected.to_csv(index=False),
+                           file_name="bulk_import_rejects.csv", mime="text/csv")
+    
+    if len(accepted) and st.button(f"📥 Import {len(accepted)} Supplier Quotes"):
+        batch = bulk_import.build_suppliers(accepted, datetime.now().isoformat())
+        if add_suppliers(batch, index):
+            product_count = len(set(product_index for product_index, _ in batch))
+            add_log("Bulk Import", f"Imported {len(batch)} supplier quotes for {product_count} products "
+                    f"from '{uploaded.name}' ({len(rejected)} rows rejected)")
+            st.session_state["bulk_imported"] = f"Imported {len(batch)} supplier quotes from '{uploaded.name}'"
+            st.session_state["bulk_upload_round"] = upload_round + 1
+            st.rerun()
+
+def load_latest_prices(product_index):
+    """Current price per supplier position and tier of one product, from the history snapshot"""
+    try:
+        with instrumentation.span('load.prices'):
+            return price_history.latest(product_index)
+    except Exception as e:
+        st.warning(f"Could not load price history: {e}")
+    return {}
+
+def format_price(price, latest):
+    """Format a tier price, noting the last change when the history has one"""
+    if latest is None:
+        return f"₹{price}"
+    text = f"₹{latest['price']:g}"
+    if latest['previous'] is not None:
+        arrow = "▲" if latest['price'] > latest['previous'] else "▼"
+        since = datetime.fromtimestamp(latest['since']).strftime('%Y-%m-%d')
+        text += f" ({arrow} from ₹{latest['previous']:g} on {since})"
+    return text
+
+def update_prices_form(product_index, position, supplier, product_name):
+    """Edit one supplier's tier prices in place, keeping the old ones in the price history"""
+    pricing = supplier.get('quantity_pricing', {})
+    if not pricing:
+        return
+    with st.form(f"update_prices_{product_index}_{position}"):
+        st.markdown("**✏️ Update Prices**")
+        cols = st.columns(len(pricing))
+        new_pricing = {}
+        for col, (tier, price) in zip(cols, pricing.items()):
+            try:
+                value = float(price)
+            except (TypeError, ValueError):
+                value = 0.0
+            new_pricing[tier] = col.number_input(f"{tier} (₹):", min_value=0.0, value=value,
+                                                 key=f"price_{product_index}_{position}_{tier}")
+        if st.form_submit_button("💾 Save Prices"):
+            changed = [tier for tier in pricing if new_pricing[tier] != pricing[tier]]
+            name = supplier.get('supplier_name', '')
+            if not changed:
+                st.info("Prices are unchanged")
+            elif update_supplier_prices(product_index, position, supplier, new_pricing):
+                add_log("Prices Updated", f"Updated {', '.join(changed)} prices of '{name}' for product "
+                        f"'{product_name}'", product_name, name)
+                st.success(f"Updated prices for {name}")
+                st.rerun()
+
+def product_price_history(product_index):
+    """Show every recorded price revision of one product and its range over a window"""
+    with st.expander("📈 Price History", expanded=False):
+        days = st.selectbox("Window:", [30, 90, 365], index=1, format_func=lambda d: f"Last {d} days",
+                            key=f"price_window_{product_index}")
+        try:
+            with instrumentation.span('load.price_history'):
+                ranges = price_history.price_range(start=datetime.now() - timedelta(days=days),
+                                                   product_index=product_index)
+                revisions = price_history.revisions(product_index=product_index)
+        except Exception as e:
+            st.warning(f"Could not load price history: {e}")
+            return
+        if not revisions:
+            st.info("No price changes recorded for this product yet")
+            return
+        if ranges:
+            st.dataframe([{
+                '#': r['position'] + 1, 'Supplier': r['supplier_name'], 'Tier': r['tier'], 'Min (₹)': r['min_price'],
+                'Max (₹)': r['max_price'], 'Latest (₹)': r['last_price'], 'Changes': r['revisions'],
+            } for r in ranges], hide_index=True)
+        st.caption(f"{len(revisions)} recorded revisions")
+        st.dataframe([{
+            'Date': r['timestamp'], '#': r['position'] + 1, 'Supplier': r['supplier_name'], 'Tier': r['tier'],
+            'Price (₹)': r['price'],
+        } for r in reversed(revisions)], hide_index=True)
+
+def price_trends_section(index, sourcing_data):
+    """Chart the average price index per category over time, recomputed in a background job"""
+    if not len(price_history):
+        st.info("No price history yet. Prices are recorded as suppliers are added or updated.")
+        if sourcing_data and st.button("Start history from current supplier prices", key="seed_price_history"):
+            try:
+                count = seed_from_sourcing(price_history, sourcing_data)
+            except Exception as e:
+                st.error(f"Could not record price history: {e}")
+                return
+            add_log("Price History Started", f"Recorded {count} current tier prices")
+            st.rerun()
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        days = st.selectbox("Window:", [90, 180, 365, 730], index=2, format_func=lambda d: f"Last {d} days",
+                            key="trend_window")
+    with col2:
+        period_days = st.selectbox("Period:", [7, 30], format_func=lambda d: "Weekly" if d == 7 else "Monthly",
+                                   key="trend_period")
+    try:
+        job = jobs.submit('price_trend', trend_job, index.by_id, days, period_days,
+                          key=('price_trend', price_history.signature(), catalog_version(),
+                               datetime.now().date(), days, period_days))
+    except Exception as e:
+        st.warning(f"Could not load price history: {e}")
+        return
+    job_status(job.id, "price_trend", show_trend)
+
+def trend_job(context, products_by_index, days, period_days):
+    """Background job that recomputes the category price trend over the whole history"""
+    context.report(0, message=f"Averaging {len(price_history):,} price revisions")
+    with instrumentation.span('load.price_trend'):
+        return price_history.category_trend(
+            lambda product_index: products_by_index.get(product_index, {}).get('category_name', DEFAULT_CATEGORY),
+            start=datetime.now() - timedelta(days=days), period_days=period_days)
+
+def show_trend(trend):
+    """Chart a computed trend for the categories the user picks"""
+    if not trend:
+        st.info("No price changes in this window")
+        return
+    revisions = {}
+    for point in trend:
+        revisions[point['category_name']] = revisions.get(point['category_name'], 0) + point['revisions']
+    busiest = sorted(revisions, key=revisions.get, reverse=True)
+    chosen = st.multiselect("Categories:", busiest, default=busiest[:5], key="trend_categories")
+    st.line_chart([point for point in trend if point['category_name'] in chosen],
+                  x='period_start', y='price_index', color='category_name')
+    st.caption("100 = price at the start of the window, averaged over every supplier and tier that changed")
+
+def plan_table(rows):
+    """Show plan rows under the export's column headers"""
+    st.dataframe([{header: row.get(key, '') for header, key, _ in export.PLAN_COLUMNS} for row in rows],
+                 hide_index=True)
+
+def plan_job(context, demand, tiers, products_by_index):
+    """Background job that plans orders, reporting progress per chunk of demand lines"""
+    from sourcing_core.planner import plan_orders  # loads numpy on first use
+    context.report(0, message=f"Planning {len(demand)} demand lines")
+    with instrumentation.span('plan.orders', lines=len(demand)):
+        return plan_orders(demand, tiers, products_by_index,
+                           progress=lambda done, total: context.report(done, total))
+
+def show_plan(plan, job_id, version):
+    """Show a finished order plan and offer it for export"""
+    if version != catalog_version():
+        st.info("Supplier data changed since this plan was made; plan again to refresh it")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Cost (₹)", f"{plan.total_cost:,.2f}")
+    col2.metric("Order Lines", len(plan.orders))
+    col3.metric("Unfilled Demand Lines", f"{len(plan.unfilled)} of {plan.line_count}")
+    if plan.orders:
+        plan_table(paginate(plan.orders, "plan", page_size=50, reset_on=job_id))
+    if plan.unfilled:
+        st.markdown("**Unfilled demand**")
+        plan_table(plan.unfilled)
+    export_panel("order_plan", "📄 Export Order Plan", "order_plan", export.PLAN_COLUMNS, plan.rows,
+                 "Order Plan", version=job_id, total=len(plan.orders) + len(plan.unfilled))
+
+def planner_section(index):
+    """Plan purchase orders for a pasted demand list in the background and show the plan"""
+    demand_text = st.text_area(
+        "Demand (one line per product: product_index, quantity, optional deadline YYYY-MM-DD):",
+        key="plan_demand", placeholder=f"12, 500, {(datetime.now() + timedelta(days=14)).date()}\n40, 120",
+    )
+    if st.button("🧮 Plan Orders", key="plan_orders"):
+        from sourcing_core.planner import parse_demand
+        demand, errors = parse_demand(demand_text)
+        for error in errors[:10]:
+            st.warning(error)
+        if demand:
+            version = catalog_version()
+            lines = tuple((item['product_index'], item['quantity'], item['deadline']) for item in demand)
+            job = jobs.submit('plan', plan_job, demand, index.tier_columns, index.by_id,
+                              key=('plan', lines, version, datetime.now().date()))
+            st.session_state["order_plan"] = (job.id, version)
+        else:
+            st.warning("Enter at least one demand line")
+    
+    if "order_plan" in st.session_state:
+        job_id, version = st.session_state["order_plan"]
+        job_status(job_id, "order_plan_job", lambda plan: show_plan(plan, job_id, version))
+
+def diagnostics_requested():
+    """Whether the page was opened with ``?diagnostics=1``"""
+    query_params = getattr(st, 'query_params', None)
+    if query_params is not None:
+        return query_params.get("diagnostics") == "1"
+    # Streamlit before 1.30 only has the experimental API, with list values
+    return st.experimental_get_query_params().get("diagnostics") == ["1"]
 
 def main():
     st.markdown('<h1 class="main-header">📦 Simple SKU Sourcing</h1>', unsafe_allow_html=True)
     
-    # Load data
-    products = load_sku_data()
-    sourcing_data = load_sourcing_data()
+    # Load data (cached until the underlying files or database change)
+    index = load_catalog_index()
+    products = index.products
+    sourcing_data = index.sourcing
+    show_cache_stats()
     
     if not products:
         st.error("No SKU data found. Please ensure 'final_sku.json' is in the current directory.")
         return
     
-    # Create tabs
-    tab1, tab2, tab3 = st.tabs(["📋 Products", "💰 Sourcing", "📊 Logs"])
+    # Create tabs (the diagnostics tab only for operators who ask for it)
+    tab_names = ["📋 Products", "💰 Sourcing", "📊 Logs"]
+    if SHOW_DIAGNOSTICS or diagnostics_requested():
+        tab_names.append("🩺 Diagnostics")
+    tabs = st.tabs(tab_names)
+    tab1, tab2, tab3 = tabs[:3]
     
-    with tab1:
+    with tab1, instrumentation.span('render.products'):
         st.markdown("## 📋 Product Management")
         
-        # Get unique categories
-        categories = sorted(list(set(product.get('category_name', 'Uncategorized') for product in products)))
+        categories = index.categories
         
         # Category dropdown in main area
         col1, col2 = st.columns([2, 1])
@@ -157,25 +687,40 @@ def main():
             )
         
         with col2:
-            search_term = st.text_input("🔍 Search by Product Name:", "")
+            search_term = st.text_input(
+                "🔍 Search Products:", "",
+                help="Matches name, brand, category, weight and description; tolerates typos"
+            )
+            suggestions = index.search.autocomplete(search_term)
+            if suggestions:
+                st.caption("Suggestions: " + ", ".join(suggestions))
         
         # Filter products
-        filtered_products = products
-        if selected_category != "All Categories":
-            filtered_products = [p for p in filtered_products if p.get('category_name', 'Uncategorized') == selected_category]
-        
-        if search_term:
-            filtered_products = [p for p in filtered_products if search_term.lower() in p['product_name'].lower()]
+        with instrumentation.span('filter.products'):
+            filtered_products = products
+            if search_term:
+                # Ranked search results, narrowed to the selected category; only
+                # the page shown gets ranked, and page changes reuse the matches
+                keep = None
+                if selected_category != "All Categories":
+                    keep = lambda p: p.get('category_name', 'Uncategorized') == selected_category
+                filtered_products = cache.get('product_search', (catalog_version(), search_term, selected_category),
+                                              lambda: index.search.matches(search_term, keep))
+            elif selected_category != "All Categories":
+                filtered_products = index.products_in(selected_category)
         
         # Display category summary
         if selected_category == "All Categories":
             st.markdown(f"### 📦 All Products ({len(filtered_products)} total)")
             
             # Show category breakdown
-            category_counts = {}
-            for product in filtered_products:
-                category = product.get('category_name', 'Uncategorized')
-                category_counts[category] = category_counts.get(category, 0) + 1
+            if search_term:
+                category_counts = {}
+                for product in filtered_products.unranked():
+                    category = product.get('category_name', 'Uncategorized')
+                    category_counts[category] = category_counts.get(category, 0) + 1
+            else:
+                category_counts = index.category_counts
             
             col1, col2, col3, col4 = st.columns(4)
             for i, (category, count) in enumerate(sorted(category_counts.items())):
@@ -185,7 +730,9 @@ def main():
         else:
             st.markdown(f"### 📦 {selected_category} Products ({len(filtered_products)} products)")
         
-        for product in filtered_products:
+        # Render only the current page of matches
+        visible_products = paginate(filtered_products, "products", reset_on=(selected_category, search_term))
+        for product in visible_products:
             with st.expander(f"📦 {product['product_name']}", expanded=False):
                 col1, col2 = st.columns([2, 1])
                 
@@ -232,10 +779,8 @@ def main():
             
             if st.form_submit_button("Add Product"):
                 if new_product_name and new_category:
-                    # Find next product index
-                    max_index = max(p['product_index'] for p in products) if products else 0
                     new_product = {
-                        "product_index": max_index + 1,
+                        "product_index": index.next_product_index(),
                         "product_name": new_product_name,
                         "price_numeric": new_price,
                         "weight_quantity": new_weight,
@@ -243,33 +788,24 @@ def main():
                         "category_name": new_category
                     }
                     
-                    products.append(new_product)
-                    if save_sku_data(products):
+                    if add_product(new_product, index):
                         add_log("Product Added", f"Added product '{new_product_name}' to category '{new_category}'", new_product_name)
                         st.success(f"Added new product: {new_product_name}")
                         st.rerun()
                 else:
                     st.error("Please fill in product name and category")
     
-    with tab2:
+    with tab2, instrumentation.span('render.sourcing'):
         st.markdown("## 💰 Sourcing Management")
         
         # Product selection
         st.markdown("### Select Product")
         
-        # Group products by category for easier selection
-        product_options = {}
-        for product in products:
-            category = product.get('category_name', 'Uncategorized')
-            if category not in product_options:
-                product_options[category] = []
-            product_options[category].append(product)
-        
-        # Product selection dropdown
-        selected_category_sourcing = st.selectbox("Category:", ["Select Category"] + list(product_options.keys()))
+        # Product selection dropdown, grouped by category
+        selected_category_sourcing = st.selectbox("Category:", ["Select Category"] + index.categories)
         
         if selected_category_sourcing != "Select Category":
-            category_products = product_options[selected_category_sourcing]
+            category_products = index.products_in(selected_category_sourcing)
             selected_product = st.selectbox(
                 "Product:",
                 category_products,
@@ -292,7 +828,10 @@ def main():
                 existing_suppliers = sourcing_data.get(str(product_index), [])
                 if existing_suppliers:
                     st.markdown("### 📋 Existing Suppliers")
-                    for i, supplier in enumerate(existing_suppliers):
+                    visible_suppliers = paginate(existing_suppliers, "suppliers", page_size=10, reset_on=product_index)
+                    latest_prices = load_latest_prices(product_index)
+                    for supplier in visible_suppliers:
+                        position = next(i for i, record in enumerate(existing_suppliers) if record is supplier)
                         with st.expander(f"🏢 {supplier.get('supplier_name', 'Unknown')}", expanded=False):
                             col1, col2 = st.columns(2)
                             with col1:
@@ -301,8 +840,21 @@ def main():
                                 st.write(f"**MOQ:** {supplier.get('moq', 'N/A')}")
                             with col2:
                                 st.write("**Quantity Pricing:**")
+                                current = latest_prices.get(position, {})
                                 for tier, price in supplier.get('quantity_pricing', {}).items():
-                                    st.write(f"• {tier} units: ₹{price}")
+                                    st.write(f"• {tier} units: {format_price(price, current.get(tier))}")
+                            update_prices_form(product_index, position, supplier, selected_product['product_name'])
+                    
+                    product_price_history(product_index)
+                    
+                    # Cheapest supplier at each order quantity for this product
+                    st.markdown("#### 💡 Best Quote by Quantity")
+                    with instrumentation.span('quotes.product'):
+                        quotes = index.quotes.best_quotes(parse_quantities(DEFAULT_QUOTE_QUANTITIES), [product_index])
+                    if quotes.empty:
+                        st.info("No supplier can fill these quantities at a non-zero price")
+                    else:
+                        show_quote_table(quotes, index)
                 
                 # Add new supplier
                 st.markdown("### ➕ Add New Supplier")
@@ -349,60 +901,69 @@ def main():
                                 "added_date": datetime.now().isoformat()
                             }
                             
-                            # Add to existing suppliers or create new list
-                            if str(product_index) not in sourcing_data:
-                                sourcing_data[str(product_index)] = []
-                            
-                            sourcing_data[str(product_index)].append(new_supplier)
-                            
-                            if save_sourcing_data(sourcing_data):
+                            if add_supplier(product_index, new_supplier, index):
                                 add_log("Supplier Added", f"Added supplier '{supplier_name}' for product '{selected_product['product_name']}'", selected_product['product_name'], supplier_name)
                                 st.success(f"Added supplier: {supplier_name}")
                                 st.rerun()
                         else:
                             st.error("Please enter supplier name")
         
+        # Bulk supplier import
+        st.markdown("---")
+        st.markdown("### 📥 Bulk Import Suppliers")
+        bulk_import_section(index)
+        
+        # Best price across all products
+        st.markdown("---")
+        st.markdown("### 💡 Best Price by Quantity")
+        
+        if sourcing_data:
+            quantity_text = st.text_input("Order quantities (comma-separated):", DEFAULT_QUOTE_QUANTITIES)
+            quantities = parse_quantities(quantity_text)
+            if quantities:
+                # One entry, rebuilt only when the catalog or the quantities change
+                with instrumentation.span('quotes.all'):
+                    quotes = cache.get('best_quotes', (catalog_version(), tuple(quantities)),
+                                       lambda: index.quotes.best_quotes(quantities))
+                st.caption(f"{len(quotes)} product/quantity combinations with an eligible supplier")
+                show_quote_table(paginate(quotes, "quotes", page_size=50, reset_on=tuple(quantities)), index)
+            else:
+                st.warning("Enter at least one positive quantity")
+        else:
+            st.info("Add suppliers to compare quotes")
+        
+        # Price movement per category
+        st.markdown("---")
+        st.markdown("### 📈 Price Trends")
+        price_trends_section(index, sourcing_data)
+        
+        # Order planning across suppliers
+        st.markdown("---")
+        st.markdown("### 🧮 Procurement Planner")
+        
+        if sourcing_data:
+            planner_section(index)
+        else:
+            st.info("Add suppliers to plan orders")
+        
         # Export section
         st.markdown("---")
         st.markdown("### 📊 Export Data")
         
-        if st.button("📄 Export Sourcing Data"):
-            if sourcing_data:
-                # Create export DataFrame
-                export_data = []
-                for product_index, suppliers in sourcing_data.items():
-                    product = next((p for p in products if p['product_index'] == int(product_index)), None)
-                    if product:
-                        for supplier in suppliers:
-                            for tier, price in supplier.get('quantity_pricing', {}).items():
-                                export_data.append({
-                                    'Product Index': product_index,
-                                    'Product Name': product['product_name'],
-                                    'Category': product.get('category_name', 'Uncategorized'),
-                                    'Supplier Name': supplier.get('supplier_name', ''),
-                                    'Contact Info': supplier.get('contact_info', ''),
-                                    'Delivery Time': supplier.get('delivery_time', ''),
-                                    'MOQ': supplier.get('moq', ''),
-                                    'Min Quantity': tier,
-                                    'Price': price
-                                })
-                
-                if export_data:
-                    df = pd.DataFrame(export_data)
-                    df.to_excel('sourcing_export.xlsx', index=False)
-                    st.success("Exported to 'sourcing_export.xlsx'")
-                else:
-                    st.warning("No data to export")
-            else:
-                st.warning("No sourcing data available")
+        if sourcing_data:
+            export_panel("sourcing", "📄 Export Sourcing Data", "sourcing_export",
+                         export.SOURCING_COLUMNS, index.iter_tier_rows, "Sourcing",
+                         version=catalog_version(), total=lambda: len(index.tier_columns.price))
+        else:
+            st.warning("No sourcing data available")
     
-    with tab3:
+    with tab3, instrumentation.span('render.logs'):
         st.markdown("## 📊 Application Logs")
         
-        # Load logs
-        logs = load_logs()
+        # Load the log index (extended in place as new entries arrive)
+        log_index = load_log_index()
         
-        if not logs:
+        if not len(log_index):
             st.info("No logs available yet. Start using the application to see activity logs.")
         else:
             # Filter options
@@ -410,12 +971,10 @@ def main():
             
             with col1:
                 # Action filter
-                actions = sorted(list(set(log.get('action', '') for log in logs)))
-                selected_action = st.selectbox("Filter by Action:", ["All Actions"] + actions)
+                selected_action = st.selectbox("Filter by Action:", ["All Actions"] + log_index.action_names())
             
             with col2:
                 # Date filter
-                from datetime import datetime, timedelta
                 today = datetime.now().date()
                 date_filter = st.selectbox("Filter by Date:", 
                     ["All Time", "Today", "Last 7 Days", "Last 30 Days"])
@@ -424,47 +983,37 @@ def main():
                 # Search
                 search_log = st.text_input("🔍 Search in logs:", "")
             
-            # Filter logs
-            filtered_logs = logs
-            
-            if selected_action != "All Actions":
-                filtered_logs = [log for log in filtered_logs if log.get('action') == selected_action]
-            
-            if date_filter != "All Time":
-                cutoff_date = None
-                if date_filter == "Today":
-                    cutoff_date = today
-                elif date_filter == "Last 7 Days":
-                    cutoff_date = today - timedelta(days=7)
-                elif date_filter == "Last 30 Days":
-                    cutoff_date = today - timedelta(days=30)
-                
-                if cutoff_date:
-                    filtered_logs = [log for log in filtered_logs 
-                                   if datetime.fromisoformat(log['timestamp'].split('T')[0]).date() >= cutoff_date]
+            cutoff_date = None
+            if date_filter == "Today":
+                cutoff_date = today
+            elif date_filter == "Last 7 Days":
+                cutoff_date = today - timedelta(days=7)
+            elif date_filter == "Last 30 Days":
+                cutoff_date = today - timedelta(days=30)
             
-            if search_log:
-                filtered_logs = [log for log in filtered_logs 
-                               if search_log.lower() in log.get('details', '').lower() 
-                               or search_log.lower() in log.get('product_name', '').lower()
-                               or search_log.lower() in log.get('supplier_name', '').lower()]
+            # Filter logs through the day partitions, action index and token index
+            with instrumentation.span('filter.logs'):
+                positions = log_index.query(
+                    action=selected_action if selected_action != "All Actions" else None,
+                    start=cutoff_date,
+                    text=search_log
+                )
             
             # Display logs
-            st.markdown(f"### Showing {len(filtered_logs)} log entries")
+            st.markdown(f"### Showing {len(positions)} log entries")
             
             # Export logs
-            if st.button("📄 Export Logs"):
-                if filtered_logs:
-                    df = pd.DataFrame(filtered_logs)
-                    df.to_excel('application_logs.xlsx', index=False)
-                    st.success("Exported logs to 'application_logs.xlsx'")
-                else:
-                    st.warning("No logs to export")
+            export_panel("logs", "📄 Export Logs", "application_logs", export.LOG_COLUMNS,
+                         lambda: (log_index.entries[position] for position in positions), "Logs",
+                         version=(activity_log.signature(), selected_action, date_filter, cutoff_date, search_log),
+                         total=len(positions))
+            log_compaction_panel()
             
-            # Display logs in reverse chronological order
-            for log in reversed(filtered_logs):
-                timestamp = datetime.fromisoformat(log['timestamp'].replace('Z', '+00:00'))
-                formatted_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            # Display the current page in reverse chronological order
+            visible_positions = paginate(positions, "logs", reset_on=(selected_action, date_filter, search_log), reverse=True)
+            for position in visible_positions:
+                log = log_index.entries[position]
+                formatted_time = log_index.display_times[position]
                 
                 with st.expander(f"🕒 {formatted_time} - {log.get('action', 'Unknown Action')}", expanded=False):
                     col1, col2 = st.columns([2, 1])
@@ -480,5 +1029,14 @@ def main():
                         st.write(f"**Action:** {log.get('action', 'Unknown')}")
                         st.write(f"**Time:** {formatted_time}")
 
+    if len(tabs) > 3:
+        with tabs[3]:
+            diagnostics_panel()
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Every rerun is recorded as one instrumentation run
+    instrumentation.start_run()
+    try:
+        main()
+    finally:
+        instrumentation.finish_run() 
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""UI-free core of the sourcing form: storage, indexes, quotes, planning, price history,
+exports, background jobs and logs.
+
+Nothing here imports Streamlit, so the same code serves the app, the
+``python -m sourcing_core`` command line and scheduled batch jobs.
+
+Submodules and the commonly used names below are imported on first access,
+so ``import sourcing_core`` is cheap and pandas, numpy and openpyxl are only
+loaded by the code paths that need them (quotes, bulk import, xlsx export).
+"""
+
+import importlib
+
+_SUBMODULES = (
+    'activity_log', 'bulk_import', 'catalog_index', 'columnar', 'data_cache', 'export',
+    'instrumentation', 'jobs', 'log_query', 'planner', 'price_history', 'quote_engine', 'search_index',
+    'snapshot', 'storage', 'write_coordination',
+)
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    'CatalogIndex': 'catalog_index',
+    'DataCache': 'data_cache',
+    'JobRunner': 'jobs',
+    'LogIndex': 'log_query',
+    'PriceHistory': 'price_history',
+    'ProductColumns': 'columnar',
+    'QuoteBook': 'quote_engine',
+    'SearchIndex': 'search_index',
+    'TierColumns': 'columnar',
+    'VersionConflict': 'write_coordination',
+    'cache': 'data_cache',
+    'export_rows': 'export',
+    'get_storage': 'storage',
+    'migrate_json_to_sqlite': 'storage',
+    'plan_orders': 'planner',
+    'with_margins': 'quote_engine',
+}
+
+__all__ = list(_SUBMODULES) + list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    if name in _EXPORTS:
+        module = importlib.import_module(f'{__name__}.{_EXPORTS[name]}')
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
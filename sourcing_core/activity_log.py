@@ -0,0 +1,284 @@
+"""Append-only, segmented activity log.
+
+Each log entry is written as one JSON line to the active segment file inside
+the log directory. When the active segment grows past ``MAX_SEGMENT_BYTES`` a
+new segment is started, and closed segments can optionally be gzipped into an
+archive. Segment names carry a zero-padded sequence number, so sorting them by
+name gives chronological order.
+
+Appending never reads the existing history, so logging costs the same no
+matter how much history is kept. Readers stream only the segments they need:
+the most recent N entries come from the newest segments, and a time window
+skips every segment that ends before it starts.
+"""
+
+import gzip
+import json
+import os
+import shutil
+from datetime import date, datetime
+
+from . import instrumentation
+from .data_cache import file_signature
+from .write_coordination import file_lock
+
+LOG_DIR = 'app_logs'
+LEGACY_LOG_FILE = 'app_logs.json'
+MAX_SEGMENT_BYTES = 1024 * 1024
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.jsonl'
+ARCHIVE_SUFFIX = '.jsonl.gz'
+# Lock shared by every process appending to or rotating a log directory
+APPEND_LOCK = 'append'
+
+# {log_dir: {(segment path, inode): first timestamp}}, see _first_timestamps
+_first_stamps = {}
+
+
+def _segment_name(number, archived=False):
+    return f"{SEGMENT_PREFIX}{number:06d}{ARCHIVE_SUFFIX if archived else SEGMENT_SUFFIX}"
+
+
+def _segment_number(filename):
+    stem = filename[len(SEGMENT_PREFIX):].split('.', 1)[0]
+    return int(stem)
+
+
+def list_segments(log_dir=LOG_DIR):
+    """Return segment paths in chronological order"""
+    if not os.path.isdir(log_dir):
+        return []
+    names = [
+        name for name in os.listdir(log_dir)
+        if name.startswith(SEGMENT_PREFIX)
+        and (name.endswith(SEGMENT_SUFFIX) or name.endswith(ARCHIVE_SUFFIX))
+    ]
+    names.sort(key=_segment_number)
+    return [os.path.join(log_dir, name) for name in names]
+
+
+def legacy_log_path(log_dir=LOG_DIR):
+    """Return the old single-file log that sits next to ``log_dir``"""
+    return os.path.join(os.path.dirname(os.path.abspath(log_dir)), LEGACY_LOG_FILE)
+
+
+def _auto_legacy_path(log_dir):
+    """Legacy log that readers and appends migrate on their own, or None
+
+    Only the app's own ``LOG_DIR`` takes over its ``app_logs.json``; other
+    directories (exports, benchmarks, tests) never touch a legacy file
+    unless ``migrate_legacy_log`` is called explicitly.
+    """
+    if os.path.abspath(log_dir) != os.path.abspath(LOG_DIR):
+        return None
+    return legacy_log_path(log_dir)
+
+
+def signature(log_dir=LOG_DIR):
+    """Return a value that changes whenever an entry is appended"""
+    segments = list_segments(log_dir)
+    paths = segments[-1:]
+    legacy_path = _auto_legacy_path(log_dir)
+    if legacy_path is not None:
+        paths = [legacy_path] + paths
+    return (len(segments),) + file_signature(*paths)
+
+
+def _open_segment(path):
+    if path.endswith(ARCHIVE_SUFFIX):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _active_segment(log_dir):
+    """Return the path of the segment new entries should be appended to"""
+    segments = list_segments(log_dir)
+    if segments and not segments[-1].endswith(ARCHIVE_SUFFIX):
+        return segments[-1]
+    number = _segment_number(os.path.basename(segments[-1])) + 1 if segments else 1
+    return os.path.join(log_dir, _segment_name(number))
+
+
+def _rotate(path, compress):
+    """Close the given segment by starting the next one, archiving it if asked"""
+    number = _segment_number(os.path.basename(path))
+    log_dir = os.path.dirname(path)
+    next_path = os.path.join(log_dir, _segment_name(number + 1))
+    open(next_path, 'a', encoding='utf-8').close()
+    if compress:
+        archive_segment(path)
+    return next_path
+
+
+def archive_segment(path):
+    """Gzip a closed segment and remove the plain copy"""
+    archive_path = path[:-len(SEGMENT_SUFFIX)] + ARCHIVE_SUFFIX
+    with open(path, 'rb') as source, gzip.open(archive_path, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    os.remove(path)
+    return archive_path
+
+
+def archive_old_segments(log_dir=LOG_DIR, keep_plain=1):
+    """Gzip every closed segment except the newest ``keep_plain`` ones"""
+    if not os.path.isdir(log_dir):
+        return []
+    with file_lock(os.path.join(log_dir, APPEND_LOCK)):
+        plain = [path for path in list_segments(log_dir) if path.endswith(SEGMENT_SUFFIX)]
+        archived = []
+        for path in plain[:-keep_plain] if keep_plain else plain:
+            archived.append(archive_segment(path))
+    return archived
+
+
+def append_entry(entry, log_dir=LOG_DIR, max_segment_bytes=MAX_SEGMENT_BYTES, compress=False):
+    """Append one entry as a JSON line, rotating the segment when it is full
+
+    An entry without a ``timestamp`` is stamped while the append lock is
+    held, so concurrent sessions and processes write entries in timestamp
+    order and readers can rely on it.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    # Rotation and archiving move files, so appends from other sessions and
+    # processes must not pick the active segment while that happens
+    with file_lock(os.path.join(log_dir, APPEND_LOCK)):
+        if 'timestamp' not in entry:
+            entry = {'timestamp': datetime.now().isoformat(), **entry}
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        _migrate_legacy_log(_auto_legacy_path(log_dir), log_dir)
+        path = _active_segment(log_dir)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(line)
+            size = file.tell()
+        instrumentation.add_bytes('log_written', len(line.encode('utf-8')))
+        if size >= max_segment_bytes:
+            _rotate(path, compress)
+    return True
+
+
+def _read_lines(path):
+    entries = []
+    instrumentation.add_bytes('log_read', os.path.getsize(path))
+    with _open_segment(path) as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+def _first_timestamp(path):
+    with _open_segment(path) as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                return json.loads(line)['timestamp']
+    return None
+
+
+def _first_timestamps(log_dir, segments):
+    """Return the first timestamp of each segment, decoding only segments not seen before
+
+    A segment's first line never changes once written, so the stamps are
+    kept per (path, inode); archiving a segment or recreating the log
+    directory gives new keys. Empty segments are looked at again next time.
+    """
+    known = _first_stamps.get(log_dir, {})
+    current = {}
+    stamps = []
+    for path in segments:
+        key = (path, os.stat(path).st_ino)
+        stamp = known.get(key)
+        if stamp is None:
+            stamp = _first_timestamp(path)
+        if stamp is not None:
+            current[key] = stamp
+        stamps.append(stamp)
+    _first_stamps[log_dir] = current
+    return stamps
+
+
+def read_recent(limit, log_dir=LOG_DIR):
+    """Return the most recent ``limit`` entries, oldest first"""
+    _auto_migrate(log_dir)
+    collected = []
+    for path in reversed(list_segments(log_dir)):
+        entries = _read_lines(path)
+        collected = entries + collected
+        if limit is not None and len(collected) >= limit:
+            return collected[-limit:]
+    return collected
+
+
+def read_window(start=None, end=None, log_dir=LOG_DIR):
+    """Yield entries whose timestamp lies in [start, end), oldest first
+
+    ``start`` and ``end`` may be dates, datetimes or ISO strings. Segments
+    that end before ``start`` are skipped without being decoded.
+    """
+    _auto_migrate(log_dir)
+    if isinstance(start, date):
+        start = start.isoformat()
+    if isinstance(end, date):
+        end = end.isoformat()
+
+    segments = list_segments(log_dir)
+    first_stamps = _first_timestamps(log_dir, segments)
+    for i, path in enumerate(segments):
+        next_stamp = first_stamps[i + 1] if i + 1 < len(segments) else None
+        if start and next_stamp and next_stamp <= start:
+            continue
+        if end and first_stamps[i] and first_stamps[i] >= end:
+            break
+        instrumentation.add_bytes('log_read', os.path.getsize(path))
+        with _open_segment(path) as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                timestamp = entry.get('timestamp', '')
+                if start and timestamp < start:
+                    continue
+                if end and timestamp >= end:
+                    return
+                yield entry
+
+
+def _auto_migrate(log_dir):
+    legacy_path = _auto_legacy_path(log_dir)
+    if legacy_path is not None:
+        migrate_legacy_log(legacy_path, log_dir)
+
+
+def migrate_legacy_log(legacy_path=None, log_dir=LOG_DIR):
+    """Move entries from the old single-file ``app_logs.json`` into segments
+
+    ``legacy_path`` defaults to the ``app_logs.json`` next to ``log_dir``.
+    """
+    legacy_path = legacy_path or legacy_log_path(log_dir)
+    if not os.path.exists(legacy_path):
+        return 0
+    os.makedirs(log_dir, exist_ok=True)
+    # Readers call this too; the lock keeps two of them from both copying
+    # the legacy entries, and appends from picking a segment meanwhile
+    with file_lock(os.path.join(log_dir, APPEND_LOCK)):
+        return _migrate_legacy_log(legacy_path, log_dir)
+
+
+def _migrate_legacy_log(legacy_path, log_dir):
+    """Move the legacy entries; the caller holds the append lock"""
+    if legacy_path is None or not os.path.exists(legacy_path):
+        return 0
+    with open(legacy_path, 'r', encoding='utf-8') as file:
+        logs = json.load(file)
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, _segment_name(1))
+    if list_segments(log_dir):
+        # Legacy entries are older than anything already segmented
+        path = os.path.join(log_dir, _segment_name(0))
+    with open(path, 'a', encoding='utf-8') as file:
+        for entry in logs:
+            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    os.replace(legacy_path, legacy_path + '.migrated')
+    return len(logs)
@@ -0,0 +1,166 @@
+"""Bulk import of supplier quotes from CSV/XLSX price lists.
+
+The pipeline has three stages:
+
+1. ``read_upload`` loads the file into a DataFrame of strings and
+   ``guess_mapping`` proposes which column feeds which supplier field.
+2. ``validate`` checks every row in vectorized passes: the product name or
+   index must match the catalog, the supplier name must be present, numbers
+   must parse and quantity slabs must be ascending. Each rejected row keeps
+   the first reason it failed.
+3. ``build_suppliers`` turns the accepted rows into supplier records in the
+   same shape as ``add_supplier_form`` produces, ready to be committed in a
+   single storage write.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+SLAB_COUNT = 3
+SUPPLIER_FIELDS = ['product_name', 'product_index', 'supplier_name', 'contact_info',
+                   'delivery_time', 'moq']
+SLAB_FIELDS = [f"slab{i}_{part}" for i in range(1, SLAB_COUNT + 1) for part in ('min', 'price')]
+FIELDS = SUPPLIER_FIELDS + SLAB_FIELDS
+REJECT_COLUMN = 'reject_reason'
+
+# Alternative column names recognised by guess_mapping
+_ALIASES = {
+    'product_name': ['product', 'product name', 'item', 'sku name'],
+    'product_index': ['product index', 'product id', 'sku', 'index'],
+    'supplier_name': ['supplier', 'supplier name', 'vendor', 'distributor'],
+    'contact_info': ['contact', 'contact info', 'phone', 'email'],
+    'delivery_time': ['delivery time', 'lead time', 'delivery days', 'lead time days'],
+    'moq': ['moq', 'minimum order quantity', 'min order'],
+}
+
+
+def _normalize(name):
+    return re.sub(r'[^a-z0-9]+', ' ', str(name).lower()).strip()
+
+
+def read_upload(file, filename):
+    """Read an uploaded CSV or XLSX file with every column as text"""
+    if filename.lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(file, dtype=str).fillna('')
+    return pd.read_csv(file, dtype=str, keep_default_na=False)
+
+
+def guess_mapping(columns):
+    """Return {field: column} for the fields whose column name is recognisable"""
+    normalized = {_normalize(column): column for column in columns}
+    mapping = {}
+    for field in FIELDS:
+        candidates = [_normalize(field)] + _ALIASES.get(field, [])
+        if field.startswith('slab'):
+            number, part = field[4], field.split('_')[1]
+            candidates += [f"slab {number} {part}", f"slab {number} {'min qty' if part == 'min' else 'price'}",
+                           f"tier {number} {part}", f"tier {number} {'qty' if part == 'min' else 'price'}"]
+        for candidate in candidates:
+            if candidate in normalized:
+                mapping[field] = normalized[candidate]
+                break
+    return mapping
+
+
+def _column(df, mapping, field):
+    column = mapping.get(field)
+    if column is None:
+        return pd.Series([''] * len(df), index=df.index, dtype=object)
+    return df[column].astype(str).str.strip()
+
+
+def _numeric(series):
+    return pd.to_numeric(series.replace('', np.nan), errors='coerce')
+
+
+def validate(df, mapping, products):
+    """Split the upload into (accepted, rejected) DataFrames
+
+    Both frames carry normalized columns named after ``FIELDS``; the
+    accepted frame has ``product_index`` resolved, the rejected one has a
+    ``reject_reason`` column.
+    """
+    rows = pd.DataFrame(index=df.index)
+    reason = pd.Series('', index=df.index, dtype=object)
+
+    def reject(mask, message):
+        nonlocal reason
+        reason = reason.mask(mask & (reason == ''), message)
+
+    # Resolve products by index when mapped, otherwise by exact (case-insensitive) name
+    known_indexes = {product['product_index'] for product in products}
+    if 'product_index' in mapping:
+        product_index = _numeric(_column(df, mapping, 'product_index'))
+        reject(product_index.isna(), "Product index is not a number")
+        reject(product_index.notna() & ~product_index.isin(known_indexes), "Unknown product index")
+    else:
+        by_name = {}
+        for product in products:
+            by_name.setdefault(_normalize(product['product_name']), product['product_index'])
+        names = _column(df, mapping, 'product_name').map(_normalize)
+        product_index = names.map(by_name)
+        reject(names == '', "Missing product name")
+        reject(product_index.isna(), "Product name not found in catalog")
+    rows['product_index'] = product_index
+
+    rows['supplier_name'] = _column(df, mapping, 'supplier_name')
+    reject(rows['supplier_name'] == '', "Missing supplier name")
+    rows['contact_info'] = _column(df, mapping, 'contact_info')
+
+    for field, minimum in (('delivery_time', 1), ('moq', 1)):
+        raw = _column(df, mapping, field)
+        values = _numeric(raw)
+        reject((raw != '') & values.isna(), f"{field} is not a number")
+        reject(values < minimum, f"{field} must be at least {minimum}")
+        rows[field] = values
+
+    previous_min = None
+    for slab in range(1, SLAB_COUNT + 1):
+        raw_min = _column(df, mapping, f"slab{slab}_min")
+        raw_price = _column(df, mapping, f"slab{slab}_price")
+        slab_min = _numeric(raw_min)
+        slab_price = _numeric(raw_price)
+        present = (raw_min != '') | (raw_price != '')
+        if slab == 1:
+            reject(~present, "Slab 1 is required")
+        reject(present & (slab_min.isna() | slab_price.isna()), f"Slab {slab} needs a numeric min qty and price")
+        reject(present & (slab_min < 1), f"Slab {slab} min qty must be at least 1")
+        reject(present & (slab_price < 0), f"Slab {slab} price cannot be negative")
+        if previous_min is not None:
+            reject(present & previous_min.isna(), f"Slab {slab} given without slab {slab - 1}")
+            reject(present & (slab_min <= previous_min),
+                   "Quantity slabs should be in ascending order (e.g., 1, 10, 50)")
+        rows[f"slab{slab}_min"] = slab_min.where(present)
+        rows[f"slab{slab}_price"] = slab_price.where(present)
+        previous_min = slab_min.where(present)
+
+    accepted = rows[reason == ''].copy()
+    accepted['product_index'] = accepted['product_index'].astype(int)
+    rejected = df[reason != ''].copy()
+    rejected[REJECT_COLUMN] = reason[reason != '']
+    return accepted, rejected
+
+
+def build_suppliers(accepted, added_date):
+    """Return [(product_index, supplier record)] for the accepted rows"""
+    batch = []
+    for row in accepted.to_dict('records'):
+        supplier = {
+            "supplier_name": row['supplier_name'],
+            "contact_info": row['contact_info'],
+        }
+        if not pd.isna(row['delivery_time']):
+            supplier["delivery_time"] = int(row['delivery_time'])
+        if not pd.isna(row['moq']):
+            supplier["moq"] = int(row['moq'])
+        pricing = {}
+        for slab in range(1, SLAB_COUNT + 1):
+            slab_min = row[f"slab{slab}_min"]
+            if not pd.isna(slab_min):
+                pricing[f"{int(slab_min)}+"] = float(row[f"slab{slab}_price"])
+        supplier["quantity_pricing"] = pricing
+        supplier["added_date"] = added_date
+        batch.append((row['product_index'], supplier))
+    return batch
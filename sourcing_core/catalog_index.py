@@ -0,0 +1,147 @@
+"""Precomputed catalog indexes and derived views.
+
+``CatalogIndex`` is built once per data version from the products list and
+the sourcing map, and then kept up to date incrementally as products and
+suppliers are added. It replaces the structures ``main()`` used to rebuild on
+every rerun: the sorted category list, per-category counts and groupings, the
+next free ``product_index`` and the product lookup used by the export. It
+also owns the product search index, the columnar product and tier arrays
+and the quote book, each built the first time it is needed; numpy and the
+quote engine (and with it pandas) are only imported at that point.
+"""
+
+import bisect
+import threading
+
+from .search_index import SearchIndex
+from .storage import DEFAULT_CATEGORY
+
+
+class CatalogIndex:
+    """By-id map, by-category postings and counters over the catalog
+
+    The index holds references to the cached ``products`` list and
+    ``sourcing`` map and appends to them on ``add_product``/``add_supplier``,
+    so those cached values stay current without being reloaded.
+    """
+
+    def __init__(self, products, sourcing_data):
+        self.products = products
+        self.sourcing = sourcing_data
+        self.by_id = {}
+        self.by_category = {}
+        self.categories = []
+        self.max_index = 0
+        self._search = None
+        self._product_columns = None
+        self._tier_columns = None
+        self._quotes = None
+        self._lock = threading.Lock()
+        for product in products:
+            self._index_product(product)
+        self.categories = sorted(self.by_category)
+
+    def _index_product(self, product):
+        product_index = product['product_index']
+        # First record wins, matching the old linear next(...) lookup
+        self.by_id.setdefault(product_index, product)
+        category = product.get('category_name', DEFAULT_CATEGORY)
+        postings = self.by_category.get(category)
+        if postings is None:
+            postings = self.by_category[category] = []
+        postings.append(product)
+        if product_index > self.max_index:
+            self.max_index = product_index
+
+    @property
+    def category_counts(self):
+        """Return {category: product count}"""
+        return {category: len(postings) for category, postings in self.by_category.items()}
+
+    def products_in(self, category):
+        """Return the products of one category"""
+        return self.by_category.get(category, [])
+
+    @property
+    def search(self):
+        """Return the full-text search index, built on first use"""
+        if self._search is None:
+            with self._lock:
+                if self._search is None:
+                    self._search = SearchIndex(self.products)
+        return self._search
+
+    @property
+    def product_columns(self):
+        """Return the columnar product arrays, rebuilt after products change"""
+        columns = self._product_columns
+        if columns is None:
+            from .columnar import ProductColumns
+            columns = self._product_columns = ProductColumns(self.products)
+        return columns
+
+    @property
+    def tier_columns(self):
+        """Return the columnar supplier and tier arrays, rebuilt after suppliers change"""
+        columns = self._tier_columns
+        if columns is None:
+            from .columnar import TierColumns
+            columns = self._tier_columns = TierColumns(self.sourcing)
+        return columns
+
+    @property
+    def quotes(self):
+        """Return the numeric quote book, rebuilt after suppliers change"""
+        quotes = self._quotes
+        if quotes is None:
+            # numpy/pandas are only loaded once quotes are actually needed
+            from .quote_engine import QuoteBook
+            quotes = self._quotes = QuoteBook(self.tier_columns)
+        return quotes
+
+    def get(self, product_index):
+        """Return the product with the given index, or None"""
+        return self.by_id.get(product_index)
+
+    def suppliers_for(self, product_index):
+        """Return the supplier records of one product"""
+        return self.sourcing.get(str(product_index), [])
+
+    def next_product_index(self):
+        """Return the index a newly added product should get"""
+        return self.max_index + 1
+
+    def add_product(self, product):
+        """Index a product that was just saved"""
+        category = product.get('category_name', DEFAULT_CATEGORY)
+        with self._lock:
+            self.products.append(product)
+            if category not in self.by_category:
+                bisect.insort(self.categories, category)
+            self._index_product(product)
+            if self._search is not None:
+                self._search.add_product(product)
+            self._product_columns = None
+
+    def add_supplier(self, product_index, supplier):
+        """Record a supplier that was just saved"""
+        with self._lock:
+            self.sourcing.setdefault(str(product_index), []).append(supplier)
+            self._tier_columns = None
+            self._quotes = None
+
+    def add_suppliers(self, batch):
+        """Record a batch of (product_index, supplier) pairs that was just saved"""
+        with self._lock:
+            for product_index, supplier in batch:
+                self.sourcing.setdefault(str(product_index), []).append(supplier)
+            self._tier_columns = None
+            self._quotes = None
+
+    def iter_tier_rows(self):
+        """Return the flat export rows, one per (product, supplier, price tier)
+
+        The rows are a ``columnar.TierRows`` view, which the exporters read
+        column values from without building a dict per row.
+        """
+        return self.tier_columns.rows(self.by_id)
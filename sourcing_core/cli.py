@@ -0,0 +1,222 @@
+"""Command line for batch jobs: ``python -m sourcing_core <command>``.
+
+Commands:
+
+* ``migrate``       copy the JSON files into an SQLite database
+* ``export``        write sourcing tiers or logs as csv/xlsx/parquet
+* ``quote``         best supplier per product at the given order quantities
+* ``product``       one product and its suppliers, without loading the catalog
+* ``plan``          split a demand list across suppliers at least cost
+* ``prices``        seed, list and summarize the supplier price history
+* ``logs``          filter the activity log by action, date range and text
+* ``compact-logs``  gzip closed log segments
+
+Submodules are imported inside each command, so a command only pays for the
+libraries it uses.
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+
+def _storage(args):
+    from .storage import get_storage
+    return get_storage(args.backend)
+
+
+def cmd_migrate(args):
+    from .storage import migrate_json_to_sqlite
+
+    product_count, supplier_count = migrate_json_to_sqlite(args.db, args.sku, args.sourcing)
+    print(f"Migrated {product_count} products and {supplier_count} suppliers into {args.db}")
+
+
+def cmd_export(args):
+    from . import activity_log, export
+
+    if args.dataset == 'logs':
+        rows, columns = activity_log.read_window(args.since, args.until, log_dir=args.log_dir), export.LOG_COLUMNS
+    else:
+        rows, columns = _storage(args).iter_tier_rows(), export.SOURCING_COLUMNS
+    output = args.output or f"{args.dataset}_export.{args.format}"
+    path, count = export.export_rows(rows, columns, args.format, output,
+                                     sheet_title=args.dataset.capitalize())
+    print(f"Exported {count} rows to {path}")
+
+
+def cmd_quote(args):
+    from .catalog_index import CatalogIndex
+    from .quote_engine import with_margins
+
+    storage = _storage(args)
+    index = CatalogIndex(storage.load_products(), storage.load_sourcing())
+    quotes = with_margins(index.quotes.best_quotes(args.quantities, args.product), index.product_columns)
+    if args.output:
+        quotes.to_csv(args.output, index=False)
+        print(f"Wrote {len(quotes)} quotes to {args.output}")
+    elif quotes.empty:
+        print("No supplier can fill these quantities")
+    else:
+        print(quotes.to_string(index=False))
+
+
+def cmd_product(args):
+    storage = _storage(args)
+    product = storage.get_product(args.product_index)
+    if product is None:
+        raise ValueError(f"No product {args.product_index}")
+    print(f"{product['product_index']}  {product['product_name']}  "
+          f"[{product.get('category_name', '')}]")
+    for supplier in storage.suppliers_for(args.product_index):
+        prices = ", ".join(f"{tier}: {price}" for tier, price in supplier.get('quantity_pricing', {}).items())
+        print(f"  {supplier.get('supplier_name', ''):<24} {prices}")
+
+
+def cmd_plan(args):
+    from . import export
+    from .catalog_index import CatalogIndex
+    from .planner import parse_demand, plan_orders
+
+    with open(args.demand, 'r', encoding='utf-8') as file:
+        demand, errors = parse_demand(file.read())
+    for error in errors:
+        print(f"Skipped {error}", file=sys.stderr)
+    storage = _storage(args)
+    index = CatalogIndex(storage.load_products(), storage.load_sourcing())
+    plan = plan_orders(demand, index.tier_columns, index.by_id, workers=args.workers)
+    print(f"{len(plan.orders)} order lines, total cost {plan.total_cost:.2f}; "
+          f"{len(plan.unfilled)} of {plan.line_count} demand lines unfilled")
+    if args.output:
+        fmt = os.path.splitext(args.output)[1].lstrip('.') or 'csv'
+        path, count = export.export_rows(plan.rows(), export.PLAN_COLUMNS, fmt, args.output,
+                                         sheet_title='Order Plan')
+        print(f"Wrote {count} rows to {path}")
+    else:
+        for row in plan.orders:
+            print(f"{row['line']:>5}  {row['product_index']:>6} {row['product_name'][:40]:<40} "
+                  f"{row['supplier_name']:<24} {row['quantity']:>7} {row['total_cost']:>12.2f}")
+        for row in plan.unfilled:
+            print(f"{row['line']:>5}  {row['product_index']:>6} {row['product_name'][:40]:<40} {row['note']}")
+
+
+def cmd_prices(args):
+    from .price_history import PriceHistory, seed_from_sourcing
+
+    history = PriceHistory(args.history_dir)
+    if args.action == 'seed':
+        count = seed_from_sourcing(history, _storage(args).load_sourcing())
+        print(f"Recorded {count} tier prices")
+    elif args.action == 'show':
+        for row in history.revisions(args.since, args.until, args.product, args.supplier):
+            print(f"{row['timestamp']}  {row['product_index']:>6} {row['supplier_name']:<24} "
+                  f"{row['tier']:<8} {row['price']:>10.2f}")
+    elif args.action == 'range':
+        for row in history.price_range(args.since, args.until, args.product):
+            print(f"{row['product_index']:>6} {row['supplier_name']:<24} {row['tier']:<8} "
+                  f"min {row['min_price']:>10.2f}  max {row['max_price']:>10.2f}  "
+                  f"last {row['last_price']:>10.2f}  ({row['revisions']} revisions)")
+    else:
+        from .storage import DEFAULT_CATEGORY
+
+        categories = {product['product_index']: product.get('category_name', DEFAULT_CATEGORY)
+                      for product in _storage(args).load_products()}
+        trend = history.category_trend(lambda product_index: categories.get(product_index, DEFAULT_CATEGORY),
+                                       args.since, args.until, args.period_days)
+        for point in trend:
+            print(f"{point['category_name']:<32} {point['period_start']}  {point['price_index']:8.2f}  "
+                  f"({point['revisions']} revisions)")
+
+
+def cmd_logs(args):
+    from . import activity_log
+    from .log_query import LogIndex
+
+    index = LogIndex(activity_log.read_window(args.since, log_dir=args.log_dir))
+    positions = index.query(action=args.action, end=args.until, text=args.text)
+    for position in list(positions)[-args.limit:] if args.limit else positions:
+        entry = index.entries[position]
+        print(f"{index.display_times[position]}  {entry.get('action', '')}: {entry.get('details', '')}")
+
+
+def cmd_compact_logs(args):
+    from . import activity_log
+
+    archived = activity_log.archive_old_segments(args.log_dir, keep_plain=args.keep)
+    print(f"Archived {len(archived)} log segments")
+
+
+def build_parser():
+    from .activity_log import LOG_DIR
+    from .price_history import PRICE_HISTORY_DIR
+    from .storage import DB_FILE, SKU_FILE, SOURCING_FILE
+
+    parser = argparse.ArgumentParser(prog='python -m sourcing_core', description="Sourcing data tools")
+    parser.add_argument('--backend', choices=['json', 'sqlite'],
+                        help="storage backend (default: $SKU_STORAGE_BACKEND or json)")
+    parser.add_argument('--log-dir', default=LOG_DIR)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help="Copy the JSON files into an SQLite database")
+    migrate.add_argument('--db', default=DB_FILE)
+    migrate.add_argument('--sku', default=SKU_FILE)
+    migrate.add_argument('--sourcing', default=SOURCING_FILE)
+    migrate.set_defaults(handler=cmd_migrate)
+
+    export = subparsers.add_parser('export', help="Export sourcing tiers or logs")
+    export.add_argument('dataset', choices=['sourcing', 'logs'])
+    export.add_argument('--format', choices=['csv', 'xlsx', 'parquet'], default='csv')
+    export.add_argument('--output', help="output file (default: <dataset>_export.<format>)")
+    export.add_argument('--since', type=date.fromisoformat, help="logs only: first day (YYYY-MM-DD)")
+    export.add_argument('--until', type=date.fromisoformat, help="logs only: day after the last one")
+    export.set_defaults(handler=cmd_export)
+
+    quote = subparsers.add_parser('quote', help="Best supplier per product at order quantities")
+    quote.add_argument('quantities', type=int, nargs='+')
+    quote.add_argument('--product', type=int, action='append', help="limit to a product index (repeatable)")
+    quote.add_argument('--output', help="write the quotes as CSV instead of printing them")
+    quote.set_defaults(handler=cmd_quote)
+
+    product = subparsers.add_parser('product', help="Show one product and its suppliers")
+    product.add_argument('product_index', type=int)
+    product.set_defaults(handler=cmd_product)
+
+    plan = subparsers.add_parser('plan', help="Split a demand list across suppliers at least cost")
+    plan.add_argument('demand', help="file of 'product_index, quantity[, YYYY-MM-DD]' lines")
+    plan.add_argument('--output', help="write the plan to a .csv/.xlsx/.parquet file instead of printing it")
+    plan.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    plan.set_defaults(handler=cmd_plan)
+
+    prices = subparsers.add_parser('prices', help="Seed, list and summarize the supplier price history")
+    prices.add_argument('action', choices=['seed', 'show', 'range', 'trend'],
+                        help="seed from current prices, list revisions, min/max per tier, or category trend")
+    prices.add_argument('--history-dir', default=PRICE_HISTORY_DIR)
+    prices.add_argument('--product', type=int)
+    prices.add_argument('--supplier', help="show only: one supplier name")
+    prices.add_argument('--since', type=date.fromisoformat, help="first day (YYYY-MM-DD)")
+    prices.add_argument('--until', type=date.fromisoformat, help="day after the last one")
+    prices.add_argument('--period-days', type=int, default=7, help="trend only: days per period")
+    prices.set_defaults(handler=cmd_prices)
+
+    logs = subparsers.add_parser('logs', help="Filter the activity log")
+    logs.add_argument('--action')
+    logs.add_argument('--since', type=date.fromisoformat, help="first day (YYYY-MM-DD)")
+    logs.add_argument('--until', type=date.fromisoformat, help="day after the last one")
+    logs.add_argument('--text', help="words that must appear in the entry")
+    logs.add_argument('--limit', type=int, default=50, help="show the most recent N matches (0 for all)")
+    logs.set_defaults(handler=cmd_logs)
+
+    compact = subparsers.add_parser('compact-logs', help="Gzip closed log segments")
+    compact.add_argument('--keep', type=int, default=1, help="plain segments to leave uncompressed")
+    compact.set_defaults(handler=cmd_compact_logs)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
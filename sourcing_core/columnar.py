@@ -0,0 +1,405 @@
+"""Columnar in-memory layout for products, suppliers and price tiers.
+
+The JSON schema keeps every product, supplier and tier as a dict with string
+keys, and tier breakpoints as labels such as ``"50+"``. Here the same data is
+held as parallel NumPy arrays:
+
+* ``ProductColumns``: ``product_index``, ``price_numeric`` and an interned
+  category code per product.
+* ``TierColumns``: one row per supplier (product, interned supplier name,
+  MOQ, delivery time, shipping cost) and one row per tier (supplier row,
+  parsed breakpoint, price, interned label), with an offsets array giving
+  each supplier's run of tiers.
+
+Numeric filters and lookups become array operations, and repeated strings
+(categories, supplier names, tier labels) are stored once. Free text
+(product names, descriptions, contacts) stays in plain lists, where an
+absent field is marked with a sentinel rather than ``None``. Fields outside
+the known columns, and values that are not numbers where a number is
+expected, are kept per record in ``extra`` so ``to_records``/``to_sourcing``
+give back the original JSON records.
+"""
+
+import math
+
+import numpy as np
+
+from .storage import DEFAULT_CATEGORY, parse_tier_min_qty
+
+PRODUCT_COLUMNS = ('product_index', 'product_name', 'price_numeric', 'weight_quantity',
+                   'description', 'category_name')
+SUPPLIER_COLUMNS = ('supplier_name', 'contact_info', 'delivery_time', 'moq', 'shipping_cost',
+                    'quantity_pricing', 'added_date')
+_MISSING = object()
+
+
+class Interner:
+    """Maps strings to small integer codes and back"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        """Return the code of ``value``, or -1 if it was never interned"""
+        return self.codes.get(value, -1)
+
+
+def _parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class _NumericBuilder:
+    """Collects an optional numeric field as float64 plus an is-integer mask"""
+
+    def __init__(self):
+        self.values = []
+        self.integral = []
+
+    def add(self, value, extra, key):
+        if value is _MISSING or value is None:
+            if value is None:
+                extra[key] = None
+            self.values.append(math.nan)
+            self.integral.append(False)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.values.append(float(value))
+            self.integral.append(isinstance(value, int))
+        else:
+            # Keep strings and other odd values verbatim for the round trip,
+            # while numeric strings still take part in comparisons
+            extra[key] = value
+            self.values.append(_parse_number(value))
+            self.integral.append(False)
+
+    def arrays(self):
+        return np.array(self.values, dtype=np.float64), np.array(self.integral, dtype=bool)
+
+
+def _number_out(value, integral):
+    if math.isnan(value):
+        return _MISSING
+    return int(value) if integral else float(value)
+
+
+class ProductColumns:
+    """Products as parallel arrays, in catalog order"""
+
+    def __init__(self, products=()):
+        self.categories = Interner()
+        index, names, weights, descriptions, category_codes = [], [], [], [], []
+        price = _NumericBuilder()
+        self.extra = {}
+        for position, product in enumerate(products):
+            extra = {k: v for k, v in product.items() if k not in PRODUCT_COLUMNS}
+            index.append(product['product_index'])
+            names.append(product['product_name'])
+            price.add(product.get('price_numeric', _MISSING), extra, 'price_numeric')
+            weights.append(product.get('weight_quantity', _MISSING))
+            descriptions.append(product.get('description', _MISSING))
+            category = product.get('category_name')
+            category_codes.append(self.categories.code(category) if category is not None else -1)
+            if extra:
+                self.extra[position] = extra
+        self.product_index = np.array(index, dtype=np.int64)
+        self.price_numeric, self._price_integral = price.arrays()
+        self.category_code = np.array(category_codes, dtype=np.int32)
+        self.product_name = names
+        self.weight_quantity = weights
+        self.description = descriptions
+        # Position of the first record of each product_index, for lookups
+        unique, first = np.unique(self.product_index, return_index=True)
+        self._lookup_keys = unique
+        self._lookup_positions = first
+
+    def __len__(self):
+        return len(self.product_index)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the numeric arrays"""
+        return sum(a.nbytes for a in (self.product_index, self.price_numeric, self._price_integral,
+                                      self.category_code, self._lookup_keys, self._lookup_positions))
+
+    def record(self, position):
+        """Return one product in the JSON schema"""
+        product = {'product_index': int(self.product_index[position]),
+                   'product_name': self.product_name[position]}
+        extra = self.extra.get(position, {})
+        price = extra.get('price_numeric', _number_out(self.price_numeric[position], self._price_integral[position]))
+        if price is not _MISSING:
+            product['price_numeric'] = price
+        for key, values in (('weight_quantity', self.weight_quantity), ('description', self.description)):
+            if values[position] is not _MISSING:
+                product[key] = values[position]
+        code = self.category_code[position]
+        if code >= 0:
+            product['category_name'] = self.categories.values[code]
+        product.update(extra)
+        return product
+
+    def to_records(self):
+        """Return the products as a list of dicts in the JSON schema"""
+        return [self.record(position) for position in range(len(self))]
+
+    def category_name(self, position):
+        code = self.category_code[position]
+        return self.categories.values[code] if code >= 0 else DEFAULT_CATEGORY
+
+    def in_category(self, category):
+        """Return the positions of the products in one category"""
+        mask = self.category_code == self.categories.lookup(category)
+        if category == DEFAULT_CATEGORY:
+            mask |= self.category_code < 0
+        return np.flatnonzero(mask)
+
+    def price_between(self, low=None, high=None):
+        """Return the positions of products priced within [low, high]"""
+        mask = ~np.isnan(self.price_numeric)
+        if low is not None:
+            mask &= self.price_numeric >= low
+        if high is not None:
+            mask &= self.price_numeric <= high
+        return np.flatnonzero(mask)
+
+    def positions_of(self, product_indexes):
+        """Return the first position of each product index, -1 where unknown"""
+        product_indexes = np.asarray(product_indexes, dtype=np.int64)
+        if not len(self._lookup_keys):
+            return np.full(product_indexes.shape, -1, dtype=np.int64)
+        slot = np.minimum(np.searchsorted(self._lookup_keys, product_indexes), len(self._lookup_keys) - 1)
+        hit = self._lookup_keys[slot] == product_indexes
+        return np.where(hit, self._lookup_positions[slot], -1)
+
+    def view(self, positions):
+        """Return a read-only sequence of product dicts for the given positions"""
+        return RecordView(self.record, positions)
+
+
+class TierColumns:
+    """Suppliers and their price tiers as parallel arrays
+
+    Tiers of supplier ``s`` occupy rows ``tier_start[s]:tier_start[s + 1]``,
+    in the order of the supplier's ``quantity_pricing`` dict. Tier labels
+    whose breakpoint cannot be parsed get ``min_qty`` -1.
+    """
+
+    def __init__(self, sourcing_data=None):
+        self.supplier_names = Interner()
+        self.tier_labels = Interner()
+        self.extra = {}
+        products, name_codes, contacts, added_dates = [], [], [], []
+        delivery, moq, shipping = _NumericBuilder(), _NumericBuilder(), _NumericBuilder()
+        tier_start, min_qtys, prices, price_integral, label_codes = [0], [], [], [], []
+        position = 0
+        for product_index, suppliers in (sourcing_data or {}).items():
+            for supplier in suppliers:
+                extra = {k: v for k, v in supplier.items() if k not in SUPPLIER_COLUMNS}
+                products.append(int(product_index))
+                name_codes.append(self.supplier_names.code(supplier.get('supplier_name', '')))
+                contacts.append(supplier.get('contact_info', _MISSING))
+                delivery.add(supplier.get('delivery_time', _MISSING), extra, 'delivery_time')
+                moq.add(supplier.get('moq', _MISSING), extra, 'moq')
+                shipping.add(supplier.get('shipping_cost', _MISSING), extra, 'shipping_cost')
+                added_dates.append(supplier.get('added_date', _MISSING))
+                pricing = supplier.get('quantity_pricing', {})
+                prices_raw = {}
+                for label, price in pricing.items():
+                    min_qty = parse_tier_min_qty(label)
+                    min_qtys.append(-1 if min_qty is None else min_qty)
+                    label_codes.append(self.tier_labels.code(label))
+                    if isinstance(price, (int, float)) and not isinstance(price, bool):
+                        prices.append(float(price))
+                        price_integral.append(isinstance(price, int))
+                    else:
+                        prices.append(_parse_number(price))
+                        price_integral.append(False)
+                        prices_raw[label] = price
+                if prices_raw:
+                    extra['_raw_prices'] = prices_raw
+                if 'quantity_pricing' not in supplier:
+                    extra['_no_pricing'] = True
+                tier_start.append(len(min_qtys))
+                if extra:
+                    self.extra[position] = extra
+                position += 1
+
+        self.supplier_product = np.array(products, dtype=np.int64)
+        self.supplier_code = np.array(name_codes, dtype=np.int32)
+        self.delivery_time, self._delivery_integral = delivery.arrays()
+        self.moq, self._moq_integral = moq.arrays()
+        self.shipping_cost, self._shipping_integral = shipping.arrays()
+        self.contact_info = contacts
+        self.added_date = added_dates
+        self.tier_start = np.array(tier_start, dtype=np.int64)
+        self.min_qty = np.array(min_qtys, dtype=np.int64)
+        self.price = np.array(prices, dtype=np.float64)
+        self.label_code = np.array(label_codes, dtype=np.int32)
+        self._price_integral = np.array(price_integral, dtype=bool)
+
+    @property
+    def supplier_count(self):
+        return len(self.supplier_product)
+
+    def __len__(self):
+        """Number of tier rows"""
+        return len(self.min_qty)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the numeric arrays"""
+        return sum(a.nbytes for a in (
+            self.supplier_product, self.supplier_code, self.delivery_time, self._delivery_integral,
+            self.moq, self._moq_integral, self.shipping_cost, self._shipping_integral,
+            self.tier_start, self.min_qty, self.price, self.label_code, self._price_integral))
+
+    @property
+    def tier_supplier(self):
+        """Supplier row of every tier row"""
+        return np.repeat(np.arange(self.supplier_count, dtype=np.int64), np.diff(self.tier_start))
+
+    def _numeric(self, position, key):
+        values, integral = {
+            'delivery_time': (self.delivery_time, self._delivery_integral),
+            'moq': (self.moq, self._moq_integral),
+            'shipping_cost': (self.shipping_cost, self._shipping_integral),
+        }[key]
+        extra = self.extra.get(position)
+        if extra and key in extra:
+            return extra[key]
+        return _number_out(values[position], integral[position])
+
+    def tier_price(self, row, raw_prices=None):
+        """Return the price of one tier row as stored in the JSON schema"""
+        if raw_prices:
+            label = self.tier_labels.values[self.label_code[row]]
+            if label in raw_prices:
+                return raw_prices[label]
+        return _number_out(self.price[row], self._price_integral[row])
+
+    def supplier_record(self, position):
+        """Return one supplier in the JSON schema"""
+        extra = dict(self.extra.get(position, {}))
+        raw_prices = extra.pop('_raw_prices', {})
+        no_pricing = extra.pop('_no_pricing', False)
+        supplier = {'supplier_name': self.supplier_names.values[self.supplier_code[position]]}
+        if self.contact_info[position] is not _MISSING:
+            supplier['contact_info'] = self.contact_info[position]
+        for key in ('delivery_time', 'moq', 'shipping_cost'):
+            value = self._numeric(position, key)
+            if value is not _MISSING:
+                supplier[key] = value
+        if not no_pricing:
+            supplier['quantity_pricing'] = {
+                self.tier_labels.values[self.label_code[row]]: self.tier_price(row, raw_prices)
+                for row in range(self.tier_start[position], self.tier_start[position + 1])
+            }
+        if self.added_date[position] is not _MISSING:
+            supplier['added_date'] = self.added_date[position]
+        supplier.update(extra)
+        return supplier
+
+    def to_sourcing(self):
+        """Return the sourcing map in the JSON schema"""
+        sourcing_data = {}
+        for position, product_index in enumerate(self.supplier_product.tolist()):
+            sourcing_data.setdefault(str(product_index), []).append(self.supplier_record(position))
+        return sourcing_data
+
+    def suppliers_of(self, product_index):
+        """Return the supplier rows of one product"""
+        return np.flatnonzero(self.supplier_product == int(product_index))
+
+    def rows(self, products_by_index):
+        """Return an iterable of flat export rows joined with the products"""
+        return TierRows(self, products_by_index)
+
+
+class RecordView:
+    """Sequence that builds a record dict only for the item being accessed"""
+
+    def __init__(self, make_record, positions):
+        self._make_record = make_record
+        self._positions = positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return RecordView(self._make_record, self._positions[item])
+        return self._make_record(self._positions[item])
+
+    def __iter__(self):
+        for position in self._positions:
+            yield self._make_record(position)
+
+
+class TierRows:
+    """Flat (product, supplier, tier) rows over ``TierColumns``
+
+    Iterating yields dicts shaped like ``storage.iter_tier_rows``;
+    ``iter_values(keys)`` yields plain lists for the given keys, which is
+    what the exporters use so no per-row dict is built.
+    """
+
+    def __init__(self, tiers, products_by_index):
+        self.tiers = tiers
+        self.products_by_index = products_by_index
+
+    def iter_values(self, keys):
+        tiers = self.tiers
+        names = tiers.supplier_names.values
+        labels = tiers.tier_labels.values
+        starts = tiers.tier_start.tolist()
+        label_codes = tiers.label_code.tolist()
+        name_codes = tiers.supplier_code.tolist()
+        prices = tiers.price.tolist()
+        integral = tiers._price_integral.tolist()
+        for position, product_index in enumerate(tiers.supplier_product.tolist()):
+            product = self.products_by_index.get(product_index)
+            if not product:
+                continue
+            contact = tiers.contact_info[position]
+            fields = {
+                'product_index': product['product_index'],
+                'product_name': product['product_name'],
+                'category_name': product.get('category_name', DEFAULT_CATEGORY),
+                'supplier_name': names[name_codes[position]],
+                'contact_info': '' if contact is _MISSING else contact,
+            }
+            for key in ('delivery_time', 'moq'):
+                value = tiers._numeric(position, key)
+                fields[key] = '' if value is _MISSING else value
+            raw_prices = tiers.extra.get(position, {}).get('_raw_prices', {})
+            supplier_values = [fields.get(key) for key in keys]
+            tier_slots = [(i, key) for i, key in enumerate(keys) if key in ('tier', 'price')]
+            for row in range(starts[position], starts[position + 1]):
+                label = labels[label_codes[row]]
+                if label in raw_prices:
+                    price = raw_prices[label]
+                else:
+                    price = int(prices[row]) if integral[row] else prices[row]
+                values = list(supplier_values)
+                for i, key in tier_slots:
+                    values[i] = label if key == 'tier' else price
+                yield values
+
+    def __iter__(self):
+        keys = ('product_index', 'product_name', 'category_name', 'supplier_name', 'contact_info',
+                'delivery_time', 'moq', 'tier', 'price')
+        for values in self.iter_values(keys):
+            yield dict(zip(keys, values))
@@ -0,0 +1,115 @@
+"""Process-wide cache for parsed data, keyed on a data version.
+
+Every entry is stored together with the signature of the data it was built
+from: file mtime/size for the JSON files and log segments, or the version
+counter kept by the SQLite backend. A lookup compares the current signature
+with the stored one, so an entry is reused on every rerun where nothing
+changed and rebuilt as soon as any process writes new data. Writers also
+invalidate entries explicitly right after they save.
+
+The cache lives at module level, so parsed data is shared by all Streamlit
+sessions in the process. Callers must treat cached values as read-only.
+"""
+
+import os
+import threading
+
+
+def file_signature(*paths):
+    """Return a signature that changes whenever one of the files changes"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class DataCache:
+    """Versioned cache with hit/miss counters per key"""
+
+    def __init__(self):
+        self._entries = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+    def _count(self, key, counter):
+        stats = self._stats.setdefault(key, {'hits': 0, 'misses': 0, 'invalidations': 0})
+        stats[counter] += 1
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.RLock())
+
+    def get(self, key, signature, loader, refresh=None):
+        """Return the cached value for ``key``, rebuilding it when the signature changed
+
+        ``loader()`` builds the value from scratch. When ``refresh`` is given
+        and a stale value exists, ``refresh(old_value)`` is used instead so
+        the value can be brought up to date incrementally. Only one thread
+        builds a given key at a time; lookups of other keys are not blocked.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._count(key, 'hits')
+                return entry[1]
+        with self._key_lock(key):
+            with self._lock:
+                # Another thread may have built it while this one waited
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == signature:
+                    self._count(key, 'hits')
+                    return entry[1]
+                self._count(key, 'misses')
+            if entry is not None and refresh is not None:
+                value = refresh(entry[1])
+            else:
+                value = loader()
+            with self._lock:
+                # Not stored if the key was invalidated or updated meanwhile
+                if self._entries.get(key) is entry:
+                    self._entries[key] = (signature, value)
+            return value
+
+    def update(self, key, value, signature, previous):
+        """Store a value that the caller brought up to date from version ``previous``
+
+        Only applies while the cached entry is still the one built from
+        ``previous``. When another writer got in between or the entry was
+        invalidated, the entry is dropped instead, so the next ``get``
+        rebuilds it. Returns whether the value was stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == previous:
+                self._entries[key] = (signature, value)
+                return True
+            if self._entries.pop(key, None) is not None:
+                self._count(key, 'invalidations')
+            return False
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or every entry when no key is given"""
+        with self._lock:
+            for key in keys or list(self._entries):
+                if self._entries.pop(key, None) is not None:
+                    self._count(key, 'invalidations')
+
+    def invalidate_prefix(self, prefix):
+        """Drop every key that starts with ``prefix``"""
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+                self._count(key, 'invalidations')
+
+    def stats(self):
+        """Return a copy of the per-key hit/miss/invalidation counters"""
+        with self._lock:
+            return {key: dict(counters) for key, counters in self._stats.items()}
+
+
+cache = DataCache()
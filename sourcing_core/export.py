@@ -0,0 +1,182 @@
+"""Streaming export of sourcing data and logs.
+
+Rows come from a generator (the catalog's columnar tier rows or the storage
+join for sourcing tiers, the planner for order plans, the log reader for
+logs) and are written one at a time, so memory stays flat however many tier
+rows are exported. Supported formats:
+
+* ``xlsx`` with openpyxl in write-only mode
+* ``csv`` with the standard library
+* ``parquet`` with pyarrow, written in row batches (only offered when
+  pyarrow is installed)
+
+Exports are written to a temporary file and the path is returned; the UI
+hands that file to ``st.download_button`` instead of leaving a fixed-name
+file on the server.
+"""
+
+import csv
+import importlib.util
+import os
+import tempfile
+
+from . import instrumentation
+
+# (header, record key, type) for each exported column
+SOURCING_COLUMNS = [
+    ('Product Index', 'product_index', 'int'),
+    ('Product Name', 'product_name', 'str'),
+    ('Category', 'category_name', 'str'),
+    ('Supplier Name', 'supplier_name', 'str'),
+    ('Contact Info', 'contact_info', 'str'),
+    ('Delivery Time', 'delivery_time', 'int'),
+    ('MOQ', 'moq', 'int'),
+    ('Min Quantity', 'tier', 'str'),
+    ('Price', 'price', 'float'),
+]
+PLAN_COLUMNS = [
+    ('Line', 'line', 'int'),
+    ('Product Index', 'product_index', 'int'),
+    ('Product Name', 'product_name', 'str'),
+    ('Category', 'category_name', 'str'),
+    ('Demand', 'demand', 'int'),
+    ('Deadline', 'deadline', 'str'),
+    ('Supplier Name', 'supplier_name', 'str'),
+    ('Tier', 'tier', 'str'),
+    ('Order Quantity', 'quantity', 'int'),
+    ('Unit Price', 'unit_price', 'float'),
+    ('Shipping Cost', 'shipping_cost', 'float'),
+    ('Total Cost', 'total_cost', 'float'),
+    ('Delivery Time', 'delivery_time', 'int'),
+    ('Note', 'note', 'str'),
+]
+LOG_COLUMNS = [
+    ('Timestamp', 'timestamp', 'str'),
+    ('Action', 'action', 'str'),
+    ('Details', 'details', 'str'),
+    ('Product', 'product_name', 'str'),
+    ('Supplier', 'supplier_name', 'str'),
+]
+
+MIME_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+PARQUET_BATCH_ROWS = 50000
+
+
+def available_formats():
+    """Return the export formats whose libraries are installed"""
+    formats = []
+    if importlib.util.find_spec('openpyxl'):
+        formats.append('xlsx')
+    formats.append('csv')
+    if importlib.util.find_spec('pyarrow'):
+        formats.append('parquet')
+    return formats
+
+
+def _value_rows(rows, columns):
+    """Yield each row's values in column order
+
+    Row sources that can produce values directly (``columnar.TierRows``)
+    are asked to, so no intermediate dict is built per row.
+    """
+    keys = [key for _, key, _ in columns]
+    if hasattr(rows, 'iter_values'):
+        return rows.iter_values(keys)
+    return ([row.get(key, '') for key in keys] for row in rows)
+
+
+def write_csv(rows, columns, path):
+    """Write rows as CSV; returns the number of rows written"""
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([header for header, _, _ in columns])
+        for values in _value_rows(rows, columns):
+            writer.writerow(values)
+            count += 1
+    return count
+
+
+def write_xlsx(rows, columns, path, sheet_title='Export'):
+    """Write rows to an xlsx workbook in write-only mode; returns the row count"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append([header for header, _, _ in columns])
+    count = 0
+    for values in _value_rows(rows, columns):
+        sheet.append(values)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def _coerce(value, kind):
+    if value is None or value == '':
+        return None
+    try:
+        if kind == 'int':
+            return int(value)
+        if kind == 'float':
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def write_parquet(rows, columns, path, batch_rows=PARQUET_BATCH_ROWS):
+    """Write rows to Parquet in batches of ``batch_rows``; returns the row count"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string()}
+    schema = pa.schema([(header, types[kind]) for header, _, kind in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = {header: [] for header, _, _ in columns}
+        for values in _value_rows(rows, columns):
+            for (header, _, kind), value in zip(columns, values):
+                batch[header].append(_coerce(value, kind))
+            count += 1
+            if count % batch_rows == 0:
+                writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+                batch = {header: [] for header, _, _ in columns}
+        if count % batch_rows:
+            writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+    return count
+
+
+WRITERS = {
+    'xlsx': write_xlsx,
+    'csv': write_csv,
+    'parquet': write_parquet,
+}
+
+
+def export_rows(rows, columns, fmt, path=None, sheet_title='Export'):
+    """Stream ``rows`` into a file of the given format
+
+    Writes to a new temporary file unless ``path`` is given. Returns
+    (path, row count).
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix='sourcing_export_', suffix=f'.{fmt}')
+        os.close(handle)
+    try:
+        with instrumentation.span('export.write', format=fmt):
+            if fmt == 'xlsx':
+                count = write_xlsx(rows, columns, path, sheet_title)
+            else:
+                count = WRITERS[fmt](rows, columns, path)
+    except Exception:
+        os.remove(path)
+        raise
+    instrumentation.add_bytes('export_written', os.path.getsize(path))
+    return path, count
@@ -0,0 +1,164 @@
+"""Lightweight timing spans and I/O counters for the hot paths.
+
+``span(name)`` times a block with ``time.perf_counter`` and records it in two
+places: process-wide totals per span name (count, total and max duration)
+and, when a run is active on the current thread, the run's own list of
+spans. The app starts a run at the top of every Streamlit rerun and
+finishes it at the end, so each rerun leaves a record of where its time
+went; command line tools just accumulate totals.
+
+``add_bytes(counter, n)`` counts bytes read or written per kind of file
+(JSON data, log segments, exports) the same way.
+
+Finished runs are kept in a bounded in-memory ring and can be dumped as JSON
+lines. Set ``SOURCING_INSTRUMENTATION=0`` to turn everything into no-ops.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+ENABLED = os.environ.get('SOURCING_INSTRUMENTATION', '1') != '0'
+MAX_RUNS = 200
+
+_lock = threading.Lock()
+_local = threading.local()
+_totals = {}
+_bytes = {}
+_runs = deque(maxlen=MAX_RUNS)
+_run_ids = iter(range(1, 1 << 62))
+
+
+class Run:
+    """Spans and byte counts collected during one rerun or job"""
+
+    def __init__(self, label):
+        self.id = next(_run_ids)
+        self.label = label
+        self.started = datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.spans = []
+        self.bytes = {}
+        self.depth = 0
+
+    def as_dict(self):
+        return {
+            'run_id': self.id,
+            'label': self.label,
+            'started': self.started,
+            'duration_ms': self.duration_ms,
+            'spans': self.spans,
+            'bytes': self.bytes,
+        }
+
+
+def current_run():
+    return getattr(_local, 'run', None)
+
+
+def start_run(label='rerun'):
+    """Start collecting spans for the current thread"""
+    if not ENABLED:
+        return None
+    run = _local.run = Run(label)
+    return run
+
+
+def finish_run():
+    """Close the current thread's run and keep it in the ring of recent runs"""
+    run = current_run()
+    if run is None:
+        return None
+    _local.run = None
+    run.duration_ms = (time.perf_counter() - run.start) * 1000
+    with _lock:
+        _runs.append(run.as_dict())
+    return run
+
+
+@contextmanager
+def _span(name, tags):
+    run = current_run()
+    start = time.perf_counter()
+    if run is not None:
+        run.depth += 1
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        with _lock:
+            total = _totals.get(name)
+            if total is None:
+                total = _totals[name] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            total['count'] += 1
+            total['total_ms'] += duration_ms
+            if duration_ms > total['max_ms']:
+                total['max_ms'] = duration_ms
+        if run is not None:
+            run.depth -= 1
+            record = {'name': name, 'offset_ms': (start - run.start) * 1000,
+                      'duration_ms': duration_ms, 'depth': run.depth}
+            if tags:
+                record['tags'] = tags
+            run.spans.append(record)
+
+
+@contextmanager
+def _noop():
+    yield
+
+
+def span(name, **tags):
+    """Context manager timing a named phase, e.g. ``with span('load.sourcing'):``"""
+    if not ENABLED:
+        return _noop()
+    return _span(name, tags)
+
+
+def add_bytes(counter, count):
+    """Add ``count`` bytes to a named I/O counter"""
+    if not ENABLED or not count:
+        return
+    with _lock:
+        _bytes[counter] = _bytes.get(counter, 0) + count
+    run = current_run()
+    if run is not None:
+        run.bytes[counter] = run.bytes.get(counter, 0) + count
+
+
+def totals():
+    """Return a copy of the per-span totals"""
+    with _lock:
+        return {name: dict(total) for name, total in _totals.items()}
+
+
+def byte_counters():
+    """Return a copy of the process-wide byte counters"""
+    with _lock:
+        return dict(_bytes)
+
+
+def recent_runs(limit=None):
+    """Return finished runs, newest last"""
+    with _lock:
+        runs = list(_runs)
+    return runs[-limit:] if limit else runs
+
+
+def reset():
+    """Clear totals, counters and recent runs"""
+    with _lock:
+        _totals.clear()
+        _bytes.clear()
+        _runs.clear()
+
+
+def to_jsonl(runs=None):
+    """Serialize runs (default: all recent runs) as JSON lines"""
+    runs = recent_runs() if runs is None else runs
+    return ''.join(json.dumps(run, ensure_ascii=False) + '\n' for run in runs)
@@ -0,0 +1,266 @@
+"""Background jobs for exports, recomputation and log compaction.
+
+Heavy operations are submitted to a ``JobRunner`` instead of running inside
+the Streamlit script, so a long export neither blocks the session nor gets
+cut short by a rerun. Each job gets an ID, runs on a small thread pool and
+reports progress through the ``JobContext`` passed as its first argument;
+the UI polls ``runner.get(job_id)`` on later reruns.
+
+Jobs are cancelled cooperatively: ``cancel()`` sets a flag and the job
+function stops at its next ``context.check()`` or ``context.track()``
+step. Queued jobs are cancelled before they start.
+
+A job submitted with a ``key`` (which should include the data version it
+was computed from) is cached: while it runs, or after it succeeded,
+submitting the same key returns the existing job instead of starting a
+new one, so a repeated export of unchanged data is ready at once. The
+newest ``MAX_CACHED_RESULTS`` results are kept; an optional ``cleanup``
+callback releases an evicted result (e.g. removes its export file).
+
+Threads rather than processes: the jobs are mostly file I/O and openpyxl
+serialization, and their results (temporary files, plans, indexes) are
+used by the app in this same process. The planner still fans large
+demand lists out to its own process pool.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from . import instrumentation
+
+MAX_WORKERS = 2
+MAX_JOBS = 100
+MAX_CACHED_RESULTS = 32
+# Report progress from ``track`` every this many items
+TRACK_EVERY = 1000
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once cancellation was requested"""
+
+
+class Job:
+    """State of one submitted job, updated by the worker thread"""
+
+    def __init__(self, job_id, kind, key=None, cleanup=None):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.cleanup = cleanup
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.submitted = datetime.now().isoformat()
+        self.duration_ms = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def as_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': self.error,
+            'submitted': self.submitted,
+            'duration_ms': self.duration_ms,
+        }
+
+
+class JobContext:
+    """Handle a job function uses to report progress and notice cancellation"""
+
+    def __init__(self, job):
+        self._job = job
+
+    def check(self):
+        """Raise ``JobCancelled`` if the job was asked to stop"""
+        if self._job.cancel_requested:
+            raise JobCancelled(f"Job {self._job.id} cancelled")
+
+    def report(self, done, total=None, message=None):
+        """Set progress to ``done`` of ``total`` (or a 0..1 fraction) and check for cancellation"""
+        if total:
+            done = done / total
+        self._job.progress = min(max(float(done), 0.0), 1.0)
+        if message is not None:
+            self._job.message = message
+        self.check()
+
+    def track(self, items, total=None, message=None, every=TRACK_EVERY):
+        """Yield from ``items``, reporting progress every ``every`` items"""
+        self.report(0, total, message)
+        for count, item in enumerate(items, 1):
+            if count % every == 0:
+                self.report(min(count, total) if total else 0, total)
+            yield item
+
+
+class JobRunner:
+    """Thread pool that runs jobs and keeps their state and cached results"""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sourcing-job')
+        self._jobs = OrderedDict()
+        self._results = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, key=None, cleanup=None, valid=None, **kwargs):
+        """Run ``fn(context, *args, **kwargs)`` in the background and return its ``Job``
+
+        With a ``key``, a queued, running or finished job for the same key is
+        returned instead, unless ``valid(result)`` says its result is no
+        longer usable.
+        """
+        with self._lock:
+            if key is not None:
+                cached = self._jobs.get(self._results.get(key))
+                if cached is not None and (cached.active or cached.status == DONE):
+                    if cached.active or valid is None or valid(cached.result):
+                        self._results.move_to_end(key)
+                        return cached
+                    self._forget(key)
+            job = Job(f'{kind}-{next(self._ids)}', kind, key, cleanup)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._results[key] = job.id
+            self._trim()
+            job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.status = CANCELLED
+            return
+        job.status = RUNNING
+        start = time.perf_counter()
+        # Each job is recorded as an instrumentation run of its own
+        instrumentation.start_run(f'job:{job.kind}')
+        try:
+            with instrumentation.span(f'job.{job.kind}'):
+                job.result = fn(JobContext(job), *args, **kwargs)
+            job.progress = 1.0
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.status = FAILED
+        finally:
+            instrumentation.finish_run()
+            job.duration_ms = (time.perf_counter() - start) * 1000
+            if job.status != DONE and job.key is not None:
+                with self._lock:
+                    if self._results.get(job.key) == job.id:
+                        del self._results[job.key]
+
+    def _forget(self, key):
+        job = self._jobs.get(self._results.pop(key, None))
+        if job is not None and job.status == DONE and job.cleanup is not None:
+            try:
+                job.cleanup(job.result)
+            except Exception:
+                pass
+
+    def _trim(self):
+        while len(self._results) > MAX_CACHED_RESULTS:
+            self._forget(next(iter(self._results)))
+        cached = set(self._results.values())
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if not job.active and job_id not in cached][:max(len(self._jobs) - MAX_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Return the job with this ID, or None once it has been dropped"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Ask a job to stop; returns False when it already finished"""
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            job.status = CANCELLED
+        return True
+
+    def jobs(self):
+        """Return every job still tracked, oldest first"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def clear_cache(self):
+        """Forget every cached result"""
+        with self._lock:
+            for key in list(self._results):
+                self._forget(key)
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job finishes (for command line tools and tests)"""
+        job = self.get(job_id)
+        if job is not None and job.future is not None:
+            try:
+                job.future.result(timeout)
+            except Exception:
+                pass
+        return job
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """Return the process-wide runner shared by every app session"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+
+class _TrackedRows:
+    """Row source that reports progress while keeping ``iter_values`` available"""
+
+    def __init__(self, rows, context, total, message):
+        self.rows = rows
+        self.context = context
+        self.total = total
+        self.message = message
+        if hasattr(rows, 'iter_values'):
+            self.iter_values = lambda keys: self.context.track(rows.iter_values(keys), total, message)
+
+    def __iter__(self):
+        return self.context.track(self.rows, self.total, self.message)
+
+
+def export_job(context, make_rows, columns, fmt, sheet_title='Export', total=None):
+    """Job body that streams ``make_rows()`` into an export file
+
+    ``total`` is the expected row count, for progress. Returns (path, row
+    count, format); a cancelled export removes its partial file.
+    """
+    from .export import export_rows
+
+    rows = _TrackedRows(make_rows(), context, total, f"Writing {fmt}")
+    path, count = export_rows(rows, columns, fmt, sheet_title=sheet_title)
+    return path, count, fmt
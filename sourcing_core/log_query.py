@@ -0,0 +1,160 @@
+"""Indexed, time-partitioned queries over the activity log.
+
+``LogIndex`` parses every timestamp once and keeps entries in time order,
+partitioned by day, so a date range resolves to a contiguous slice of
+positions by bisecting the sorted day list. An action index and a token
+index over ``details``, ``product_name`` and ``supplier_name`` hold sorted
+position lists; a query intersects them by walking the shortest list and
+bisecting into the others, so filter combinations cost time proportional to
+the smallest matching set rather than to the whole history.
+
+The index is extended in place as new entries are appended to the log.
+"""
+
+import bisect
+from datetime import date, datetime, time
+
+from .search_index import tokenize
+
+TEXT_FIELDS = ('details', 'product_name', 'supplier_name')
+# Cap on how many vocabulary tokens a search word may expand to by prefix
+MAX_PREFIX_TOKENS = 200
+
+
+def parse_timestamp(value):
+    """Parse an ISO timestamp into a naive datetime"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def _contains(postings, position):
+    i = bisect.bisect_left(postings, position)
+    return i < len(postings) and postings[i] == position
+
+
+class LogIndex:
+    """Day-partitioned log entries with action and token postings"""
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self.iso = []
+        self.display_times = []
+        self.days = []
+        self.day_starts = []
+        self.actions = {}
+        self.tokens = {}
+        self.vocab = []
+        self.extend(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def last_timestamp(self):
+        return self.iso[-1] if self.iso else None
+
+    def _append(self, entry):
+        position = len(self.entries)
+        timestamp = parse_timestamp(entry['timestamp'])
+        self.entries.append(entry)
+        self.iso.append(entry['timestamp'])
+        self.display_times.append(timestamp.strftime("%Y-%m-%d %H:%M:%S"))
+
+        day = timestamp.date()
+        if not self.days or self.days[-1] != day:
+            self.days.append(day)
+            self.day_starts.append(position)
+
+        self.actions.setdefault(entry.get('action', ''), []).append(position)
+        words = set()
+        for field in TEXT_FIELDS:
+            words.update(tokenize(entry.get(field)))
+        for word in words:
+            postings = self.tokens.get(word)
+            if postings is None:
+                postings = self.tokens[word] = []
+                bisect.insort(self.vocab, word)
+            postings.append(position)
+
+    def extend(self, entries):
+        """Append entries in chronological order
+
+        Entries at or before the last indexed timestamp that are already
+        indexed are skipped, so re-reading a log window from
+        ``last_timestamp`` is safe.
+        """
+        last = self.last_timestamp
+        already = 0
+        if last is not None:
+            already = len(self.iso) - bisect.bisect_left(self.iso, last)
+        for entry in entries:
+            stamp = entry['timestamp']
+            if last is not None and stamp <= last:
+                if stamp == last and already > 0:
+                    already -= 1
+                    continue
+                if stamp < last:
+                    continue
+            self._append(entry)
+
+    def action_names(self):
+        """Return the sorted list of logged actions"""
+        return sorted(self.actions)
+
+    def _boundary(self, moment):
+        """Return the first position whose timestamp is at or after ``moment``"""
+        if isinstance(moment, date) and not isinstance(moment, datetime):
+            moment = datetime.combine(moment, time.min)
+        # Bisect the day partitions first, then only within the matching day
+        day = bisect.bisect_left(self.days, moment.date())
+        if day == len(self.days):
+            return len(self.entries)
+        day_start = self.day_starts[day]
+        if self.days[day] != moment.date():
+            return day_start
+        day_end = self.day_starts[day + 1] if day + 1 < len(self.days) else len(self.entries)
+        return bisect.bisect_left(self.iso, moment.isoformat(), day_start, day_end)
+
+    def _position_range(self, start, end):
+        """Return the [lo, hi) positions of entries from ``start`` up to ``end``"""
+        lo = self._boundary(start) if start is not None else 0
+        hi = self._boundary(end) if end is not None else len(self.entries)
+        return lo, max(lo, hi)
+
+    def _word_postings(self, word):
+        """Return the sorted positions of entries containing a token starting with ``word``"""
+        i = bisect.bisect_left(self.vocab, word)
+        matches = []
+        while i < len(self.vocab) and self.vocab[i].startswith(word) and len(matches) < MAX_PREFIX_TOKENS:
+            matches.append(self.tokens[self.vocab[i]])
+            i += 1
+        if len(matches) == 1:
+            return matches[0]
+        return sorted(set().union(*matches))
+
+    def query(self, action=None, start=None, end=None, text=None):
+        """Return matching positions in chronological order
+
+        ``start``/``end`` are dates or datetimes bounding [start, end);
+        ``text`` words must each prefix-match a token of the entry.
+        Without action or text filters the result is a ``range``; the
+        returned sequence must not be modified.
+        """
+        lo, hi = self._position_range(start, end)
+        lists = []
+        if action is not None:
+            lists.append(self.actions.get(action, []))
+        for word in tokenize(text):
+            lists.append(self._word_postings(word))
+        if not lists:
+            return range(lo, hi)
+
+        # Clip every list to the time range, then walk the shortest one
+        if lo > 0 or hi < len(self.entries):
+            lists = [postings[bisect.bisect_left(postings, lo):bisect.bisect_left(postings, hi)]
+                     for postings in lists]
+        if len(lists) == 1:
+            return lists[0]
+        clipped = sorted(lists, key=len)
+        shortest, others = clipped[0], clipped[1:]
+        return [position for position in shortest
+                if all(_contains(postings, position) for postings in others)]
@@ -0,0 +1,322 @@
+"""Procurement planning: split a demand list across suppliers at least cost.
+
+A demand line asks for ``quantity`` units of one product, optionally by a
+``deadline``. For each line the planner picks how many units to order from
+each of the product's suppliers so that together they cover the quantity
+at the lowest total cost, where
+
+* a supplier only takes part if its ``delivery_time`` (days) gets the goods
+  there by the deadline; with a deadline, suppliers without a delivery time
+  are left out,
+* an order from a supplier is 0 or at least its MOQ and its lowest tier
+  breakpoint, priced at the tier with the largest breakpoint not above the
+  ordered quantity (as in ``quote_engine``), plus its shipping cost once,
+* orders may be split over several suppliers and may overshoot the demand
+  when a higher tier or an MOQ makes that cheaper.
+
+Each line is a small covering knapsack solved exactly by dynamic
+programming over the quantity 0..Q, one supplier at a time. Within one
+price tier the cost is linear in the units bought, so the best split for
+every quantity is a sliding-window minimum over the previous supplier's
+cost curve, answered for all quantities at once with a NumPy sparse table.
+
+Lines are independent, so large demand lists are solved in chunks on a
+process pool.
+"""
+
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+
+from .storage import DEFAULT_CATEGORY
+
+# Largest quantity one demand line may ask for (the DP is linear in it)
+MAX_LINE_QUANTITY = 1_000_000
+# Below this many lines the pool costs more than it saves
+PARALLEL_MIN_LINES = 200
+LINES_PER_CHUNK = 100
+# The app plans from job threads, and forking a threaded process can copy
+# locks another thread holds into the workers
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def parse_demand(text):
+    """Parse ``product_index, quantity[, YYYY-MM-DD]`` lines
+
+    Returns (demand lines, error messages); blank lines, lines starting
+    with ``#`` and a ``product_index,...`` header are skipped.
+    """
+    demand, errors = [], []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#') or line.lower().startswith('product_index'):
+            continue
+        parts = [part.strip() for part in line.replace(';', ',').split(',')]
+        try:
+            if len(parts) not in (2, 3):
+                raise ValueError("expected product_index, quantity[, deadline]")
+            deadline = date.fromisoformat(parts[2]) if len(parts) == 3 and parts[2] else None
+            demand.append({'product_index': int(parts[0]), 'quantity': int(parts[1]), 'deadline': deadline})
+        except ValueError as e:
+            errors.append(f"Line {number}: {e}")
+    return demand, errors
+
+
+def supplier_options(tiers, product_index, days_available=None, suppliers=None):
+    """Return the purchasable options of one product's suppliers
+
+    Each option is (supplier row, shipping cost, segments), where segments
+    are (lowest quantity, highest quantity or None, unit price, tier row)
+    for the quantity ranges priced by each quoted tier. ``suppliers`` are
+    the product's supplier rows when the caller already has them.
+    """
+    options = []
+    if suppliers is None:
+        suppliers = tiers.suppliers_of(product_index).tolist()
+    for supplier in suppliers:
+        if days_available is not None and not tiers.delivery_time[supplier] <= days_available:
+            continue
+        moq = tiers.moq[supplier]
+        moq = int(math.ceil(moq)) if moq > 0 else 1
+        start, end = int(tiers.tier_start[supplier]), int(tiers.tier_start[supplier + 1])
+        quoted = sorted(((min_qty, row, price) for row, min_qty, price in zip(
+            range(start, end), tiers.min_qty[start:end].tolist(), tiers.price[start:end].tolist())
+            if min_qty >= 0 and price > 0), key=lambda tier: tier[0])
+        segments = []
+        for i, (min_qty, row, price) in enumerate(quoted):
+            high = quoted[i + 1][0] - 1 if i + 1 < len(quoted) else None
+            low = max(min_qty, moq, 1)
+            if high is None or low <= high:
+                segments.append((low, high, price, row))
+        if segments:
+            shipping = tiers.shipping_cost[supplier]
+            options.append((supplier, 0.0 if np.isnan(shipping) else float(shipping), segments))
+    return options
+
+
+def drop_dominated(options):
+    """Remove options that an optimal plan never needs
+
+    Option B is dominated by option A when A's prices never rise with
+    quantity, A's dearest tier is no dearer than B's cheapest, and A starts
+    at no higher a quantity and ships for no more. Any units bought from B
+    can then be bought from A instead (or added to A's order) for no more.
+    """
+    summary = []
+    for option in options:
+        prices = [price for _, _, price, _ in option[2]]
+        falling = all(b <= a for a, b in zip(prices, prices[1:]))
+        summary.append((max(prices), min(prices), option[2][0][0], option[1], falling, option))
+    summary.sort(key=lambda item: item[:4])
+    kept = []
+    for highest, lowest, start, shipping, falling, option in summary:
+        if not any(k_falling and k_highest <= lowest and k_start <= start and k_shipping <= shipping
+                   for k_highest, _, k_start, k_shipping, k_falling, _ in kept):
+            kept.append((highest, lowest, start, shipping, falling, option))
+    return [item[-1] for item in kept]
+
+
+def _window_min(values, width):
+    """Minimum of each window ``values[i - width + 1:i + 1]`` and its position
+
+    Windows reaching before the start are cut off there. Minima over
+    power-of-two spans are doubled up to ``width`` and the final window is
+    the union of two overlapping spans, so the cost is O(n log width).
+    """
+    pad = width - 1
+    current = np.concatenate([np.full(pad, np.inf), values])
+    where = np.arange(-pad, len(values))
+    span = 1
+    while span * 2 <= width:
+        a, b = current[:-span], current[span:]
+        take_b = b < a
+        current = np.where(take_b, b, a)
+        where = np.where(take_b, where[span:], where[:-span])
+        span *= 2
+    a, b = current[:len(values)], current[width - span:width - span + len(values)]
+    take_b = b < a
+    return np.where(take_b, b, a), np.where(take_b, where[width - span:width - span + len(values)],
+                                             where[:len(values)])
+
+
+def _prefix_min(values):
+    """Running minimum of ``values`` and the position where it was reached"""
+    running = np.minimum.accumulate(values)
+    positions = np.maximum.accumulate(np.where(values <= running, np.arange(len(values)), 0))
+    return running, positions
+
+
+def solve_line(quantity, options):
+    """Cheapest way to cover ``quantity`` units from ``options``
+
+    Returns (total cost, [(option position, units)]) or None when the
+    options cannot cover the quantity.
+    """
+    size = quantity + 1
+    q = np.arange(size)
+    cost = np.full(size, np.inf)
+    cost[0] = 0.0
+    choices = []
+    for _, shipping, segments in options:
+        best = cost.copy()
+        take = np.zeros(size, dtype=np.int64)
+        for low, high, price, _ in segments:
+            # Quantities up to ``low`` are covered by ordering ``low`` units alone
+            top = min(low, quantity)
+            head = best[1:top + 1]
+            better = price * low + shipping < head
+            head[better] = price * low + shipping
+            take[1:top + 1][better] = low
+            if low >= quantity:
+                continue
+            # Otherwise order x units and cover the rest j = q - x with the
+            # earlier suppliers: cost[j] + price * (q - j) + shipping, where
+            # j runs over the window [q - high, q - low]
+            rest_q = q[:quantity - low + 1]
+            shifted = cost[:quantity - low + 1] - price * rest_q
+            if high is None or high >= quantity:
+                value, rest = _prefix_min(shifted)
+            else:
+                value, rest = _window_min(shifted, high - low + 1)
+            wanted = q[low + 1:]
+            candidate = value[1:] + price * wanted + shipping
+            tail = best[low + 1:]
+            better = candidate < tail
+            tail[better] = candidate[better]
+            take[low + 1:][better] = (wanted - rest[1:])[better]
+        cost = best
+        choices.append(take)
+
+    if not np.isfinite(cost[quantity]):
+        return None
+    orders = []
+    remaining = quantity
+    for position in range(len(options) - 1, -1, -1):
+        units = int(choices[position][remaining])
+        if units:
+            orders.append((position, units))
+            remaining = max(remaining - units, 0)
+    return float(cost[quantity]), orders[::-1]
+
+
+def _solve_chunk(tasks):
+    return [(line, solve_line(quantity, options)) for line, quantity, options in tasks]
+
+
+class Plan:
+    """Order lines chosen for a demand list, plus the lines that could not be filled"""
+
+    def __init__(self, orders, unfilled, line_count):
+        self.orders = orders
+        self.unfilled = unfilled
+        self.line_count = line_count
+
+    @property
+    def total_cost(self):
+        return sum(order['total_cost'] for order in self.orders)
+
+    def rows(self):
+        """Orders followed by the unfilled lines, for ``export.PLAN_COLUMNS``"""
+        yield from self.orders
+        yield from self.unfilled
+
+
+def _segment_for(segments, units):
+    for low, high, price, row in segments:
+        if low <= units and (high is None or units <= high):
+            return price, row
+    raise ValueError(f"No tier prices {units} units")
+
+
+def plan_orders(demand, tiers, products_by_index=None, today=None, workers=None, progress=None):
+    """Plan purchase orders for ``demand`` from ``columnar.TierColumns``
+
+    ``demand`` is a list of {product_index, quantity, deadline} dicts, with
+    ``deadline`` a date or None. ``products_by_index`` supplies product
+    names and categories. Lines are solved on a process pool of ``workers``
+    (default: CPU count) once there are ``PARALLEL_MIN_LINES`` of them.
+    ``progress(lines solved, lines to solve)`` is called after each chunk
+    and may raise to abandon the plan.
+    """
+    today = today or date.today()
+    products_by_index = products_by_index or {}
+    tasks, unfilled, line_info = [], [], {}
+    # Supplier rows grouped by product, found with one sort instead of a scan per line
+    order = np.argsort(tiers.supplier_product, kind='stable')
+    grouped = tiers.supplier_product[order]
+    for line, item in enumerate(demand, 1):
+        product_index, quantity, deadline = int(item['product_index']), int(item['quantity']), item.get('deadline')
+        product = products_by_index.get(product_index, {})
+        info = {
+            'line': line,
+            'product_index': product_index,
+            'product_name': product.get('product_name', ''),
+            'category_name': product.get('category_name', DEFAULT_CATEGORY) if product else '',
+            'demand': quantity,
+            'deadline': deadline.isoformat() if deadline else '',
+        }
+        days_available = (deadline - today).days if deadline else None
+        first, last = np.searchsorted(grouped, [product_index, product_index + 1])
+        options = drop_dominated(supplier_options(tiers, product_index, days_available, order[first:last].tolist()))
+        if quantity <= 0:
+            reason = "Quantity must be positive"
+        elif quantity > MAX_LINE_QUANTITY:
+            reason = f"Quantity above {MAX_LINE_QUANTITY}"
+        elif products_by_index and not product:
+            reason = "Unknown product"
+        elif not options:
+            reason = "No supplier can deliver by the deadline" if deadline else "No supplier with prices"
+        else:
+            line_info[line] = (info, options)
+            tasks.append((line, quantity, options))
+            continue
+        unfilled.append(dict(info, note=reason))
+
+    workers = workers or os.cpu_count() or 1
+    chunks = [tasks[i:i + LINES_PER_CHUNK] for i in range(0, len(tasks), LINES_PER_CHUNK)]
+    results = []
+    if workers > 1 and len(tasks) >= PARALLEL_MIN_LINES:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(START_METHOD))
+        try:
+            for chunk in pool.map(_solve_chunk, chunks):
+                results.extend(chunk)
+                if progress is not None:
+                    progress(len(results), len(tasks))
+        finally:
+            # When progress raised, drop the chunks that have not started
+            pool.shutdown(cancel_futures=True)
+    else:
+        for chunk in chunks:
+            results.extend(_solve_chunk(chunk))
+            if progress is not None:
+                progress(len(results), len(tasks))
+
+    names = tiers.supplier_names.values
+    labels = tiers.tier_labels.values
+    orders = []
+    for line, result in results:
+        info, options = line_info[line]
+        if result is None:
+            unfilled.append(dict(info, note="Suppliers cannot cover the quantity"))
+            continue
+        for position, units in result[1]:
+            supplier, shipping, segments = options[position]
+            price, row = _segment_for(segments, units)
+            delivery = tiers.delivery_time[supplier]
+            orders.append(dict(
+                info,
+                supplier_name=names[tiers.supplier_code[supplier]],
+                tier=labels[tiers.label_code[row]],
+                quantity=units,
+                unit_price=price,
+                shipping_cost=shipping,
+                total_cost=price * units + shipping,
+                delivery_time='' if np.isnan(delivery) else int(delivery),
+                note='',
+            ))
+    unfilled.sort(key=lambda item: item['line'])
+    return Plan(orders, unfilled, len(demand))
@@ -0,0 +1,500 @@
+"""Append-only price history per (product, supplier record, tier).
+
+Every time a supplier's quoted price for a tier changes, one revision row is
+appended. Rows are stored column by column in flat binary files inside the
+history directory, written with the standard ``array`` module and read back
+with NumPy in one call per column:
+
+* ``timestamp.f64``  seconds since the epoch
+* ``product.i64``    product index
+* ``position.i32``   the supplier's position in the product's supplier list
+* ``supplier.i32``   code into ``suppliers.jsonl`` (one JSON string per line)
+* ``tier.i32``       code into ``tiers.jsonl``
+* ``price.f64``      unit price
+
+A series is keyed by product, position and tier rather than by supplier
+name: a product may list two suppliers with the same name, and positions
+never change because supplier records are only ever appended. The name is
+kept for display.
+
+Appending never rewrites history; a torn append (a crash between column
+files) is cut back to the last complete row by the next writer. New
+strings are synced to disk before the columns that refer to them.
+
+Next to the columns, ``latest/`` holds a materialized snapshot of the
+current price, the time it was set and the previous price of every series,
+sharded by product index so an append rewrites only the shards it touches
+and a lookup reads one small file. ``latest/rows.json`` records how many
+rows the snapshot covers; rows appended after that (after a crash) are
+replayed by readers and folded in by the next writer.
+"""
+
+import json
+import math
+import os
+import shutil
+from array import array
+from datetime import datetime
+
+from . import instrumentation
+from .data_cache import file_signature
+from .write_coordination import atomic_write_json, file_lock
+
+PRICE_HISTORY_DIR = 'price_history'
+COLUMNS = (
+    ('timestamp', 'd', '.f64'),
+    ('product', 'q', '.i64'),
+    ('position', 'i', '.i32'),
+    ('supplier', 'i', '.i32'),
+    ('tier', 'i', '.i32'),
+    ('price', 'd', '.f64'),
+)
+SNAPSHOT_DIR = 'latest'
+SNAPSHOT_SHARDS = 256
+APPEND_LOCK = 'append'
+DAY_SECONDS = 86400
+
+
+def _to_timestamp(value):
+    """Seconds since the epoch for a datetime, an ISO string or None (now)"""
+    if value is None:
+        return datetime.now().timestamp()
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    # A date counts from its midnight
+    return datetime(value.year, value.month, value.day).timestamp()
+
+
+def _price(value):
+    """Quoted price as a float, or None for blank, zero and non-numeric values"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 and math.isfinite(value) else None
+
+
+def _apply(latest, product_index, position, label, price, seconds):
+    """Set the current price of one series; returns False if it was unchanged
+
+    Replaying a row that is already in the snapshot leaves it unchanged, so
+    rows can safely be applied twice after a crash.
+    """
+    current = latest.setdefault(str(product_index), {}).setdefault(str(position), {})
+    entry = current.get(label)
+    if entry is not None and entry['price'] == price:
+        return False
+    current[label] = {'price': price, 'since': seconds, 'previous': entry['price'] if entry else None}
+    return True
+
+
+def _by_position(suppliers):
+    """Snapshot entry of one product with its JSON string keys turned back into positions"""
+    return {int(position): tiers for position, tiers in suppliers.items()}
+
+
+class PriceHistory:
+    """Reader and writer for one price history directory"""
+
+    def __init__(self, history_dir=PRICE_HISTORY_DIR):
+        self.history_dir = history_dir
+        self._loaded = None
+        self._loaded_signature = None
+
+    def _path(self, name):
+        return os.path.join(self.history_dir, name)
+
+    def _column_paths(self):
+        return [self._path(name + suffix) for name, _, suffix in COLUMNS]
+
+    def signature(self):
+        """Return a value that changes whenever revisions are appended"""
+        return file_signature(*self._column_paths())
+
+    # Writing
+
+    def _check_format(self):
+        """Refuse a history written without the position column
+
+        Its rows would otherwise count as incomplete and be cut back.
+        """
+        present = [os.path.exists(path) for path in self._column_paths()]
+        if any(present) and not all(present):
+            raise ValueError(f"{self.history_dir} has no position column; "
+                             f"it was written by an older version, start a new history directory")
+
+    def _complete_rows(self):
+        """Rows present in every column file"""
+        counts = []
+        for path, (_, typecode, _) in zip(self._column_paths(), COLUMNS):
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            counts.append(size // array(typecode).itemsize)
+        return min(counts)
+
+    def _read_strings(self, name, repair=False):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'rb') as file:
+            data = file.read()
+        complete = data.rfind(b'\n') + 1
+        if repair and complete < len(data):
+            with open(path, 'r+b') as file:
+                file.truncate(complete)
+        return [json.loads(line) for line in data[:complete].decode('utf-8').splitlines()]
+
+    @staticmethod
+    def _interner(values, new_values):
+        """Return a function giving the code of a string, adding unseen ones to both lists"""
+        codes = {value: code for code, value in enumerate(values)}
+
+        def code(value):
+            if value not in codes:
+                codes[value] = len(values)
+                values.append(value)
+                new_values.append(value)
+            return codes[value]
+        return code
+
+    def _read_rows(self, start, stop):
+        """Column values of rows [start, stop), read with ``array``"""
+        rows = []
+        for path, (_, typecode, _) in zip(self._column_paths(), COLUMNS):
+            column = array(typecode)
+            with open(path, 'rb') as file:
+                file.seek(start * column.itemsize)
+                column.fromfile(file, stop - start)
+            rows.append(column)
+        return rows
+
+    # Snapshot
+
+    def _shard_path(self, shard):
+        return self._path(os.path.join(SNAPSHOT_DIR, f'{shard:03d}.json'))
+
+    def _snapshot_rows(self):
+        path = self._path(os.path.join(SNAPSHOT_DIR, 'rows.json'))
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)['rows']
+
+    def _load_shard(self, shard):
+        path = self._shard_path(shard)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _replay(self, shards, start, stop, tiers, wanted=None):
+        """Apply rows [start, stop) to the loaded ``shards``, loading more as needed
+
+        With ``wanted`` only rows of those shards are applied. Returns the
+        set of shards that changed.
+        """
+        changed = set()
+        timestamps, products, positions, _, tier_codes, prices = self._read_rows(start, stop)
+        for seconds, product_index, position, tier, price in zip(timestamps, products, positions,
+                                                                  tier_codes, prices):
+            shard = product_index % SNAPSHOT_SHARDS
+            if wanted is not None and shard not in wanted:
+                continue
+            if shard not in shards:
+                shards[shard] = self._load_shard(shard)
+            if _apply(shards[shard], product_index, position, tiers[tier], price, seconds):
+                changed.add(shard)
+        return changed
+
+    def _write_snapshot(self, shards, changed, rows):
+        os.makedirs(self._path(SNAPSHOT_DIR), exist_ok=True)
+        for shard in sorted(changed):
+            atomic_write_json(self._shard_path(shard), shards[shard], indent=None)
+        atomic_write_json(self._path(os.path.join(SNAPSHOT_DIR, 'rows.json')), {'rows': rows}, indent=None)
+
+    def _catch_up(self, count, tiers):
+        """Bring the snapshot up to ``count`` rows after an interrupted append"""
+        covered = self._snapshot_rows()
+        if covered == count:
+            return
+        shards = {}
+        if covered > count:
+            # Rows the snapshot covered were cut back; rebuild it from scratch
+            shutil.rmtree(self._path(SNAPSHOT_DIR), ignore_errors=True)
+            shards = {shard: {} for shard in range(SNAPSHOT_SHARDS)}
+            covered = 0
+        changed = self._replay(shards, covered, count, tiers)
+        self._write_snapshot(shards, changed, count)
+
+    # Writing
+
+    def record_many(self, revisions):
+        """Append the price changes in ``revisions``; returns the number of rows written
+
+        ``revisions`` are (product_index, position, supplier_name,
+        quantity_pricing, timestamp) tuples, where ``position`` is the
+        supplier's position in the product's supplier list and the
+        timestamp a datetime, an ISO string or None for now. Only tiers
+        whose price differs from the current one are written; blank (zero)
+        and non-numeric prices are skipped.
+        """
+        os.makedirs(self.history_dir, exist_ok=True)
+        with instrumentation.span('price_history.append'), file_lock(self._path(APPEND_LOCK)):
+            self._check_format()
+            count = self._complete_rows()
+            for path, (_, typecode, _) in zip(self._column_paths(), COLUMNS):
+                with open(path, 'ab') as file:
+                    file.truncate(count * array(typecode).itemsize)
+            suppliers = self._read_strings('suppliers.jsonl', repair=True)
+            tiers = self._read_strings('tiers.jsonl', repair=True)
+            self._catch_up(count, tiers)
+            new_suppliers, new_tiers = [], []
+            supplier_code = self._interner(suppliers, new_suppliers)
+            tier_code = self._interner(tiers, new_tiers)
+
+            shards, changed = {}, set()
+            rows = [array(typecode) for _, typecode, _ in COLUMNS]
+            for product_index, position, supplier_name, pricing, timestamp in revisions:
+                seconds = _to_timestamp(timestamp)
+                product_index, position = int(product_index), int(position)
+                shard = product_index % SNAPSHOT_SHARDS
+                if shard not in shards:
+                    shards[shard] = self._load_shard(shard)
+                for label, value in (pricing or {}).items():
+                    price = _price(value)
+                    if price is None or not _apply(shards[shard], product_index, position, label,
+                                                   price, seconds):
+                        continue
+                    changed.add(shard)
+                    for column, field in zip(rows, (seconds, product_index, position, supplier_code(supplier_name),
+                                                    tier_code(label), price)):
+                        column.append(field)
+            added = len(rows[0])
+            if not added:
+                return 0
+
+            # Strings first and on disk, so after a crash every code in the
+            # columns can still be resolved
+            for name, values in (('suppliers.jsonl', new_suppliers), ('tiers.jsonl', new_tiers)):
+                if values:
+                    with open(self._path(name), 'a', encoding='utf-8') as file:
+                        file.write(''.join(json.dumps(value, ensure_ascii=False) + '\n' for value in values))
+                        file.flush()
+                        os.fsync(file.fileno())
+            for path, column in zip(self._column_paths(), rows):
+                with open(path, 'ab') as file:
+                    column.tofile(file)
+                    file.flush()
+                    os.fsync(file.fileno())
+                instrumentation.add_bytes('price_history_written', column.itemsize * len(column))
+            self._write_snapshot(shards, changed, count + added)
+        return added
+
+    def record(self, product_index, position, supplier_name, pricing, timestamp=None):
+        """Append one supplier's price changes; returns the number of rows written"""
+        return self.record_many([(product_index, position, supplier_name, pricing, timestamp)])
+
+    # Reading
+
+    def _columns(self):
+        """Return (columns dict of NumPy arrays, supplier names, tier labels)"""
+        import numpy as np  # only readers need numpy
+
+        signature = self.signature()
+        if self._loaded is not None and self._loaded_signature == signature:
+            return self._loaded
+        with instrumentation.span('price_history.read'):
+            count = self._complete_rows()
+            columns = {}
+            for path, (name, typecode, _) in zip(self._column_paths(), COLUMNS):
+                if count:
+                    columns[name] = np.fromfile(path, dtype=np.dtype(typecode), count=count)
+                    instrumentation.add_bytes('price_history_read', columns[name].nbytes)
+                else:
+                    columns[name] = np.empty(0, dtype=np.dtype(typecode))
+            suppliers = self._read_strings('suppliers.jsonl')
+            tiers = self._read_strings('tiers.jsonl')
+        self._loaded = (columns, suppliers, tiers)
+        self._loaded_signature = signature
+        return self._loaded
+
+    def __len__(self):
+        return self._complete_rows()
+
+    def latest(self, product_index=None):
+        """Current price per supplier and tier, from the materialized snapshot
+
+        Returns {position: {tier: {'price', 'since', 'previous'}}} for one
+        product, keyed by the supplier's position in its list, or
+        {product_index: ...} for all of them, with ``since`` in seconds since
+        the epoch.
+        """
+        wanted = range(SNAPSHOT_SHARDS) if product_index is None else [int(product_index) % SNAPSHOT_SHARDS]
+        shards = {shard: self._load_shard(shard) for shard in wanted}
+        count, covered = self._complete_rows(), self._snapshot_rows()
+        if covered != count:
+            if covered > count:
+                shards, covered = {shard: {} for shard in wanted}, 0
+            self._replay(shards, covered, count, self._read_strings('tiers.jsonl'), wanted=set(wanted))
+        if product_index is None:
+            return {int(index): _by_position(suppliers)
+                    for shard in shards.values() for index, suppliers in shard.items()}
+        return _by_position(shards[wanted[0]].get(str(int(product_index)), {}))
+
+    def _window(self, start=None, end=None, product_index=None, supplier_name=None):
+        """Row positions matching the filters, in append order"""
+        import numpy as np
+
+        columns, suppliers, _ = self._columns()
+        mask = np.ones(len(columns['timestamp']), dtype=bool)
+        if start is not None:
+            mask &= columns['timestamp'] >= _to_timestamp(start)
+        if end is not None:
+            mask &= columns['timestamp'] < _to_timestamp(end)
+        if product_index is not None:
+            mask &= columns['product'] == int(product_index)
+        if supplier_name is not None:
+            code = suppliers.index(supplier_name) if supplier_name in suppliers else -1
+            mask &= columns['supplier'] == code
+        return np.flatnonzero(mask)
+
+    def revisions(self, start=None, end=None, product_index=None, supplier_name=None):
+        """Revision rows in [start, end) as dicts, oldest first"""
+        import numpy as np
+
+        columns, suppliers, tiers = self._columns()
+        positions = self._window(start, end, product_index, supplier_name)
+        positions = positions[np.argsort(columns['timestamp'][positions], kind='stable')]
+        return [{
+            'timestamp': datetime.fromtimestamp(columns['timestamp'][row]).isoformat(timespec='seconds'),
+            'product_index': int(columns['product'][row]),
+            'position': int(columns['position'][row]),
+            'supplier_name': suppliers[columns['supplier'][row]],
+            'tier': tiers[columns['tier'][row]],
+            'price': float(columns['price'][row]),
+        } for row in positions.tolist()]
+
+    def _series(self, positions):
+        """Series id per row (one series per product, supplier position and tier) and the series keys
+
+        Keys are (product, position, supplier code, tier) rows; the supplier
+        code is that of the series' first row.
+        """
+        import numpy as np
+
+        columns, _, _ = self._columns()
+        product = columns['product'][positions]
+        position = columns['position'][positions]
+        tier = columns['tier'][positions]
+        order = np.lexsort((tier, position, product))
+        starts = np.ones(len(order), dtype=bool)
+        starts[1:] = ((product[order][1:] != product[order][:-1]) | (position[order][1:] != position[order][:-1])
+                      | (tier[order][1:] != tier[order][:-1]))
+        series = np.empty(len(order), dtype=np.int64)
+        series[order] = np.cumsum(starts) - 1
+        first = order[starts]
+        keys = np.stack([product[first], position[first].astype(np.int64),
+                         columns['supplier'][positions][first].astype(np.int64), tier[first].astype(np.int64)], axis=1)
+        return series, keys
+
+    def price_range(self, start=None, end=None, product_index=None):
+        """Min, max, first and last price per (product, supplier position, tier) in [start, end)"""
+        import numpy as np
+
+        columns, suppliers, tiers = self._columns()
+        positions = self._window(start, end, product_index)
+        if not positions.size:
+            return []
+        positions = positions[np.argsort(columns['timestamp'][positions], kind='stable')]
+        series, keys = self._series(positions)
+        prices = columns['price'][positions]
+        count = len(keys)
+        low = np.full(count, np.inf)
+        high = np.full(count, -np.inf)
+        np.minimum.at(low, series, prices)
+        np.maximum.at(high, series, prices)
+        _, first = np.unique(series, return_index=True)
+        _, last_reversed = np.unique(series[::-1], return_index=True)
+        last = len(series) - 1 - last_reversed
+        revisions = np.bincount(series, minlength=count)
+        return [{
+            'product_index': int(keys[i, 0]),
+            'position': int(keys[i, 1]),
+            'supplier_name': suppliers[keys[i, 2]],
+            'tier': tiers[keys[i, 3]],
+            'min_price': float(low[i]),
+            'max_price': float(high[i]),
+            'first_price': float(prices[first[i]]),
+            'last_price': float(prices[last[i]]),
+            'revisions': int(revisions[i]),
+        } for i in range(count)]
+
+    def category_trend(self, category_of, start=None, end=None, period_days=7):
+        """Average price index per category and period in [start, end)
+
+        Each revision is expressed relative to its series' price at the start
+        of the window (the last revision before ``start``, else the first one
+        inside it) as an index where 100 means unchanged; the indexes are
+        averaged per category over periods of ``period_days``. ``category_of``
+        maps a product index to its category name.
+        """
+        import numpy as np
+
+        columns, _, _ = self._columns()
+        inside = self._window(start, end)
+        if not inside.size:
+            return []
+        before = self._window(None, start) if start is not None else inside[:0]
+        positions = np.concatenate([before, inside])
+        positions = positions[np.argsort(columns['timestamp'][positions], kind='stable')]
+        series, keys = self._series(positions)
+        prices = columns['price'][positions]
+        timestamps = columns['timestamp'][positions]
+        in_window = timestamps >= _to_timestamp(start) if start is not None else np.ones(len(positions), bool)
+
+        # Base price: last revision before the window, else the first inside it
+        base = np.full(len(keys), np.nan)
+        _, first_inside = np.unique(series[in_window], return_index=True)
+        base[series[in_window][first_inside]] = prices[in_window][first_inside]
+        if (~in_window).any():
+            reversed_series = series[~in_window][::-1]
+            found, last_before = np.unique(reversed_series, return_index=True)
+            base[found] = prices[~in_window][::-1][last_before]
+
+        categories = {}
+        products, product_of_series = np.unique(keys[:, 0], return_inverse=True)
+        category_codes = np.array([categories.setdefault(category_of(product), len(categories))
+                                   for product in products.tolist()], dtype=np.int64)
+        product_category = category_codes[product_of_series.reshape(-1)]
+        names = list(categories)
+        relative = prices[in_window] / base[series[in_window]] * 100
+        origin = _to_timestamp(start) if start is not None else timestamps[in_window].min()
+        period = ((timestamps[in_window] - origin) // (period_days * DAY_SECONDS)).astype(np.int64)
+        groups, group = np.unique(np.stack([product_category[series[in_window]], period], axis=1),
+                                  axis=0, return_inverse=True)
+        group = group.reshape(-1)
+        totals = np.bincount(group, weights=relative, minlength=len(groups))
+        counts = np.bincount(group, minlength=len(groups))
+        return [{
+            'category_name': names[groups[i, 0]],
+            'period_start': datetime.fromtimestamp(origin + groups[i, 1] * period_days * DAY_SECONDS).date().isoformat(),
+            'price_index': float(totals[i] / counts[i]),
+            'revisions': int(counts[i]),
+        } for i in range(len(groups))]
+
+
+def seed_from_sourcing(history, sourcing_data):
+    """Record every supplier's current prices at its ``added_date``
+
+    Used once to start the history from an existing sourcing map. Suppliers
+    that already have a history are skipped, so seeding again adds nothing.
+    """
+    known = history.latest()
+    revisions = [(int(product_index), position, supplier.get('supplier_name', ''),
+                  supplier.get('quantity_pricing', {}), supplier.get('added_date'))
+                 for product_index, suppliers in sourcing_data.items()
+                 for position, supplier in enumerate(suppliers)
+                 if position not in known.get(int(product_index), {})]
+    revisions.sort(key=lambda revision: _to_timestamp(revision[4]))
+    return history.record_many(revisions)
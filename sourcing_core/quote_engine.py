@@ -0,0 +1,136 @@
+"""Best-price quotes across suppliers and quantity tiers.
+
+Suppliers store ``quantity_pricing`` as labels such as ``"10+"`` mapped to a
+unit price. ``QuoteBook`` takes the parsed breakpoint arrays of
+``columnar.TierColumns``, next to each supplier's MOQ, delivery time and
+optional shipping cost, and answers quote questions in one vectorized pass:
+
+* the cheapest landed unit price for one product at one quantity
+* the best supplier for every product at a list of quantities
+
+For a quantity Q a supplier's applicable tier is the one with the largest
+breakpoint not above Q. Suppliers whose MOQ is above Q are skipped, and
+tiers priced at zero (left blank in the form) are treated as not quoted.
+The landed unit price adds ``shipping_cost / Q`` when a supplier has one.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .columnar import ProductColumns, TierColumns
+
+QUOTE_COLUMNS = ['product_index', 'quantity', 'supplier_name', 'tier', 'unit_price',
+                 'landed_unit_price', 'total_cost', 'moq', 'delivery_time']
+
+
+def _number(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class QuoteBook:
+    """Numeric tier table built once per version of the sourcing map
+
+    Built from ``columnar.TierColumns`` (or a sourcing map, which is
+    converted first), so tier labels are already parsed and supplier names
+    and labels are carried as integer codes until a quote is returned.
+    """
+
+    def __init__(self, sourcing_data):
+        columns = sourcing_data if isinstance(sourcing_data, TierColumns) else TierColumns(sourcing_data)
+        self.columns = columns
+        valid = columns.min_qty >= 0
+        supplier = columns.tier_supplier[valid]
+        tiers = pd.DataFrame({
+            'product_index': columns.supplier_product[supplier],
+            'supplier_id': supplier,
+            'min_qty': columns.min_qty[valid],
+            'price': np.nan_to_num(columns.price[valid], nan=0.0),
+            'label_code': columns.label_code[valid],
+            'name_code': columns.supplier_code[supplier],
+            'moq': np.nan_to_num(columns.moq[supplier], nan=0.0),
+            'delivery_time': columns.delivery_time[supplier],
+            'shipping_cost': np.nan_to_num(columns.shipping_cost[supplier], nan=0.0),
+        })
+        # Breakpoints ascending within each supplier, so the applicable tier
+        # for a quantity is the last eligible row of the supplier's run
+        self.tiers = tiers.sort_values(['supplier_id', 'min_qty'], kind='stable').reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.tiers)
+
+    def best_quotes(self, quantities, product_indexes=None):
+        """Return the cheapest supplier per (product, quantity) as a DataFrame
+
+        Products without any eligible supplier at a quantity are left out.
+        """
+        quantities = np.asarray(sorted(set(int(q) for q in quantities if int(q) > 0)), dtype=np.int64)
+        tiers = self.tiers
+        if product_indexes is not None:
+            tiers = tiers[tiers['product_index'].isin(list(product_indexes))].reset_index(drop=True)
+        if tiers.empty or quantities.size == 0:
+            return pd.DataFrame(columns=QUOTE_COLUMNS)
+
+        min_qty = tiers['min_qty'].to_numpy()
+        supplier = tiers['supplier_id'].to_numpy()
+        eligible = (
+            (min_qty[:, None] <= quantities[None, :])
+            & (tiers['moq'].to_numpy()[:, None] <= quantities[None, :])
+            & (tiers['price'].to_numpy()[:, None] > 0)
+        )
+        # A row applies unless the next row of the same supplier is eligible too
+        same_supplier_next = np.zeros(len(tiers), dtype=bool)
+        same_supplier_next[:-1] = supplier[1:] == supplier[:-1]
+        next_eligible = np.zeros_like(eligible)
+        next_eligible[:-1] = eligible[1:] & same_supplier_next[:-1, None]
+        row_idx, q_idx = np.nonzero(eligible & ~next_eligible)
+
+        quotes = tiers.iloc[row_idx].reset_index(drop=True)
+        quotes['quantity'] = quantities[q_idx]
+        quotes['unit_price'] = quotes['price']
+        quotes['landed_unit_price'] = quotes['price'] + quotes['shipping_cost'] / quotes['quantity']
+        quotes['total_cost'] = quotes['landed_unit_price'] * quotes['quantity']
+        quotes = quotes.sort_values(
+            ['product_index', 'quantity', 'landed_unit_price', 'delivery_time'], kind='stable'
+        ).drop_duplicates(['product_index', 'quantity'], keep='first')
+        # Names only for the winning rows
+        names = np.asarray(self.columns.supplier_names.values, dtype=object)
+        labels = np.asarray(self.columns.tier_labels.values, dtype=object)
+        quotes['supplier_name'] = names[quotes['name_code'].to_numpy()]
+        quotes['tier'] = labels[quotes['label_code'].to_numpy()]
+        return quotes[QUOTE_COLUMNS].reset_index(drop=True)
+
+    def cheapest(self, product_index, quantity):
+        """Return the best quote for one product at one quantity as a dict, or None"""
+        quotes = self.best_quotes([quantity], [product_index])
+        if quotes.empty:
+            return None
+        return quotes.iloc[0].to_dict()
+
+
+def with_margins(quotes, products_by_index):
+    """Add the product's list price and the margin left at the landed price
+
+    ``products_by_index`` is a {product_index: product} dict or a
+    ``columnar.ProductColumns``; with the latter only the quoted products
+    are looked up.
+    """
+    quotes = quotes.copy()
+    if isinstance(products_by_index, ProductColumns):
+        products = products_by_index
+        positions = products.positions_of(quotes['product_index'].to_numpy())
+        found = positions >= 0
+        names = [products.product_name[p] if p >= 0 else '' for p in positions.tolist()]
+        prices = np.where(found, products.price_numeric[np.where(found, positions, 0)], np.nan)
+        quotes.insert(1, 'product_name', names)
+        quotes['price_numeric'] = prices
+    else:
+        prices = {index: _number(product.get('price_numeric'), np.nan)
+                  for index, product in products_by_index.items()}
+        names = {index: product.get('product_name', '') for index, product in products_by_index.items()}
+        quotes.insert(1, 'product_name', quotes['product_index'].map(names))
+        quotes['price_numeric'] = quotes['product_index'].map(prices).astype(float)
+    quotes['margin_pct'] = (quotes['price_numeric'] - quotes['landed_unit_price']) / quotes['price_numeric'] * 100
+    return quotes
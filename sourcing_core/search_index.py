@@ -0,0 +1,237 @@
+"""Full-text and fuzzy product search.
+
+``SearchIndex`` keeps a tokenized inverted index over the product name,
+brand (the first word of the name), category, weight/quantity and
+description, plus a character-trigram index over the vocabulary. A query
+token is matched exactly, then by prefix (so results update while the user
+is still typing), and only when neither finds anything, by trigram
+similarity so misspelled names still match. Results are ranked by how many
+query tokens a product matched and then by field-weighted score; only as
+many as are displayed get ranked (see ``SearchResults``).
+
+The index is built from the records ``load_sku_data`` returns and grows
+incrementally with ``add_product``. Writers and readers share one lock, since
+a query walking the postings or the vocabulary while a product is added
+could see a dict change size or a half-inserted vocabulary.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+
+FIELD_WEIGHTS = {
+    'product_name': 3.0,
+    'brand': 2.0,
+    'category_name': 1.0,
+    'weight_quantity': 1.0,
+    'description': 0.5,
+}
+# Similarity credited to a prefix match, relative to an exact match
+PREFIX_SIMILARITY = 0.8
+# Minimum trigram Jaccard similarity for a fuzzy match
+FUZZY_THRESHOLD = 0.35
+# Cap on how many vocabulary tokens one query token may expand to
+MAX_EXPANSIONS = 50
+# Added per matched query token, so matching more tokens outranks any
+# field-weighted score (at most sum(FIELD_WEIGHTS) per token)
+MATCH_BONUS = 1e6
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens"""
+    if not text:
+        return []
+    return _TOKEN.findall(str(text).lower())
+
+
+def trigrams(token):
+    """Return the set of character trigrams of a token, padded at both ends"""
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchResults:
+    """Products matching a query, ranked only as far as they are read
+
+    Supports ``len``, indexing, slicing and iteration. Reading a slice ranks
+    just the best matches up to its end with a heap, so showing the first
+    page of 20,000 matches does not sort all of them.
+    """
+
+    def __init__(self, docs, scores):
+        self._docs = docs
+        self._scores = scores
+        self._ranked = []
+
+    def _rank_key(self, doc_id):
+        return (-self._scores[doc_id], doc_id)
+
+    def _top(self, count):
+        """Return the ``count`` best doc ids, best first"""
+        if count > len(self._ranked):
+            if count >= len(self._scores):
+                self._ranked = sorted(self._scores, key=self._rank_key)
+            else:
+                self._ranked = heapq.nsmallest(count, self._scores, key=self._rank_key)
+        return self._ranked
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __iter__(self):
+        return (self._docs[doc_id] for doc_id in self._top(len(self._scores)))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            positions = range(*item.indices(len(self._scores)))
+            ranked = self._top(max(positions) + 1) if positions else []
+            return [self._docs[ranked[position]] for position in positions]
+        position = range(len(self._scores))[item]
+        return self._docs[self._top(position + 1)[position]]
+
+    def unranked(self):
+        """Iterate the matches in catalog order, without ranking them"""
+        return (self._docs[doc_id] for doc_id in self._scores)
+
+
+class SearchIndex:
+    """Inverted token index plus trigram index over product records"""
+
+    def __init__(self, products=()):
+        self.docs = []
+        self.postings = {}
+        self.vocab = []
+        self.trigram_index = {}
+        self._lock = threading.Lock()
+        for product in products:
+            self._index(product)
+        self.vocab = sorted(self.postings)
+
+    def _fields(self, product):
+        name = product.get('product_name', '')
+        name_tokens = tokenize(name)
+        yield 'product_name', name_tokens
+        yield 'brand', name_tokens[:1]
+        for field in ('category_name', 'weight_quantity', 'description'):
+            yield field, tokenize(product.get(field))
+
+    def _index(self, product):
+        """Add a product to the postings; returns tokens new to the vocabulary"""
+        doc_id = len(self.docs)
+        self.docs.append(product)
+        weights = {}
+        for field, tokens in self._fields(product):
+            for token in set(tokens):
+                weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+        new_tokens = []
+        for token, weight in weights.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = {}
+                new_tokens.append(token)
+                for gram in trigrams(token):
+                    self.trigram_index.setdefault(gram, set()).add(token)
+            postings[doc_id] = weight
+        return new_tokens
+
+    def add_product(self, product):
+        """Index a product that was just added to the catalog"""
+        with self._lock:
+            for token in self._index(product):
+                bisect.insort(self.vocab, token)
+
+    def _prefix_range(self, prefix):
+        lo = bisect.bisect_left(self.vocab, prefix)
+        hi = bisect.bisect_left(self.vocab, prefix + '\uffff', lo)
+        return lo, hi
+
+    def _expand(self, token, allow_prefix):
+        """Return [(vocabulary token, similarity)] for one query token
+
+        Callers hold ``self._lock``.
+        """
+        expansions = []
+        if token in self.postings:
+            expansions.append((token, 1.0))
+        if allow_prefix:
+            lo, hi = self._prefix_range(token)
+            candidates = [t for t in self.vocab[lo:min(hi, lo + MAX_EXPANSIONS * 10)] if t != token]
+            candidates.sort(key=lambda t: -len(self.postings[t]))
+            expansions.extend((t, PREFIX_SIMILARITY) for t in candidates[:MAX_EXPANSIONS])
+        if expansions or len(token) < 3:
+            return expansions
+
+        # Fuzzy fallback: vocabulary tokens sharing enough trigrams
+        query_grams = trigrams(token)
+        shared = {}
+        for gram in query_grams:
+            for candidate in self.trigram_index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        scored = []
+        for candidate, count in shared.items():
+            similarity = count / (len(query_grams) + len(trigrams(candidate)) - count)
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((candidate, similarity))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:MAX_EXPANSIONS]
+
+    def _scores(self, query, keep=None):
+        """Return {doc_id: rank score} for products matching any query token"""
+        tokens = tokenize(query)
+        with self._lock:
+            scores = self._score_tokens(tokens)
+        # Docs are only ever appended, so filtering needs no lock
+        if keep is not None:
+            scores = {doc_id: score for doc_id, score in scores.items() if keep(self.docs[doc_id])}
+        return scores
+
+    def _score_tokens(self, tokens):
+        """Score tokenized query words; callers hold ``self._lock``"""
+        scores = {}
+        for position, token in enumerate(tokens):
+            token_scores = None
+            for candidate, similarity in self._expand(token, allow_prefix=position == len(tokens) - 1):
+                postings = self.postings[candidate]
+                if token_scores is None:
+                    token_scores = {doc_id: weight * similarity for doc_id, weight in postings.items()}
+                    continue
+                for doc_id, weight in postings.items():
+                    score = weight * similarity
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+            if not token_scores:
+                continue
+            if not scores:
+                scores = {doc_id: MATCH_BONUS + score for doc_id, score in token_scores.items()}
+                continue
+            get = scores.get
+            for doc_id, score in token_scores.items():
+                scores[doc_id] = get(doc_id, 0.0) + MATCH_BONUS + score
+        return scores
+
+    def matches(self, query, keep=None):
+        """Return the products matching the query as ``SearchResults``
+
+        ``keep(product)``, when given, drops products before they are ranked.
+        """
+        return SearchResults(self.docs, self._scores(query, keep))
+
+    def search(self, query, limit=None):
+        """Return products matching the query, best match first"""
+        results = self.matches(query)
+        return results[:limit] if limit is not None else list(results)
+
+    def autocomplete(self, text, limit=5):
+        """Return query completions for the last word of ``text``, most common first"""
+        tokens = tokenize(text)
+        if not tokens or not text[-1:].isalnum():
+            return []
+        head, last = tokens[:-1], tokens[-1]
+        with self._lock:
+            lo, hi = self._prefix_range(last)
+            candidates = [t for t in self.vocab[lo:min(hi, lo + MAX_EXPANSIONS * 10)] if t != last]
+            candidates.sort(key=lambda t: -len(self.postings[t]))
+        return [' '.join(head + [t]) for t in candidates[:limit]]
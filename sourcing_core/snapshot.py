@@ -0,0 +1,320 @@
+"""Binary snapshots of the JSON data files for fast loading and point lookups.
+
+``final_sku.json`` and ``sourcing_data.json`` stay the source of truth, but
+pretty-printed JSON is slow to parse once catalogs grow. Whenever
+``JsonStorage`` writes one of them, and the first time it reads one that
+has no usable snapshot, it also writes ``<file>.snap``:
+
+* header: magic, format version, ``marshal`` version, the JSON file's size,
+  mtime and CRC32, the record count, a CRC32 of everything up to the
+  records and a CRC32 of the records
+* meta: the document without its records (``metadata`` and friends)
+* offsets: where each record starts, plus a CRC32 per record
+* index: the records' product indexes, sorted, with their record numbers
+* records: one ``marshal`` blob per product, or per product's supplier list
+
+Readers ``mmap`` the file. ``get(product_index)`` binary-searches the
+sorted index and decodes one record. A full load decodes every record with
+``marshal``; for the large supplier map that is well ahead of ``json`` and
+never holds the raw text in memory, while for products it is no faster, so
+``JsonStorage`` only full-loads the sourcing snapshot.
+
+A snapshot is only used while it matches its JSON file: same size and
+mtime, or, when just the mtime moved, the same CRC32 of the JSON bytes (the
+snapshot is then re-stamped with the new mtime).
+Anything else (a hand-edited JSON file, another Python's marshal format, a
+corrupt record) falls back to the JSON. ``SOURCING_SNAPSHOTS=0`` turns
+snapshots off.
+"""
+
+import gc
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from bisect import bisect_left
+
+from . import instrumentation
+from .write_coordination import replacement_mode
+
+ENABLED = os.environ.get('SOURCING_SNAPSHOTS', '1') != '0'
+SUFFIX = '.snap'
+MAGIC = b'SKUSNAP\0'
+FORMAT_VERSION = 1
+# magic, format version, marshal version, source size, source mtime (ns),
+# source CRC32, record count, CRC32 of meta + tables, CRC32 of records, meta length
+HEADER = struct.Struct('<8sHHqqIIIII')
+# Where the source mtime sits in the header, for re-stamping in place
+MTIME_OFFSET = struct.calcsize('<8sHHq')
+
+# gc.disable() is process-wide, so concurrent decodes share one pause: the
+# first one in turns the collector off, the last one out restores it
+_gc_lock = threading.Lock()
+_gc_pauses = 0
+_gc_was_enabled = False
+
+
+class SnapshotError(ValueError):
+    """The snapshot file is unreadable, from another format or corrupt"""
+
+
+def snapshot_path(source_path):
+    return source_path + SUFFIX
+
+
+def _pad(length):
+    return -length % 8
+
+
+def _records(document, records_key):
+    """Return (product indexes, records) of a products or sourcing document"""
+    records = document[records_key]
+    if isinstance(records, dict):
+        # Sourcing: {product_index: suppliers}, one record per product
+        return [int(key) for key in records], list(records.items())
+    return [int(record['product_index']) for record in records], records
+
+
+def write_snapshot(source_path, document, records_key, source_bytes, source_stat):
+    """Write the snapshot of ``document``, parsed from ``source_bytes``
+
+    ``source_stat`` is the ``os.stat`` of the JSON file those bytes were
+    read from. Raises ValueError for documents whose record keys are not
+    integers; nothing is written then.
+    """
+    keys, records = _records(document, records_key)
+    meta = {key: value for key, value in document.items() if key != records_key}
+    meta_blob = marshal.dumps((records_key, isinstance(document[records_key], dict), meta))
+    blobs = [marshal.dumps(record) for record in records]
+    count = len(blobs)
+
+    meta_end = HEADER.size + len(meta_blob) + _pad(len(meta_blob))
+    tables_size = 8 * (count + 1) + 4 * count + 8 * count + 4 * count
+    start = meta_end + tables_size + _pad(tables_size)
+    offsets = [start]
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    order = sorted(range(count), key=keys.__getitem__)
+    tables = b''.join([
+        struct.pack(f'<{count + 1}Q', *offsets),
+        struct.pack(f'<{count}I', *[zlib.crc32(blob) for blob in blobs]),
+        struct.pack(f'<{count}q', *[keys[i] for i in order]),
+        struct.pack(f'<{count}I', *order),
+    ])
+    body = meta_blob + b'\0' * _pad(len(meta_blob)) + tables + b'\0' * _pad(tables_size)
+    records_crc = 0
+    for blob in blobs:
+        records_crc = zlib.crc32(blob, records_crc)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, source_stat.st_size,
+                         source_stat.st_mtime_ns, zlib.crc32(source_bytes), count,
+                         zlib.crc32(body), records_crc, len(meta_blob))
+
+    path = snapshot_path(source_path)
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+    try:
+        with instrumentation.span('snapshot.write', file=os.path.basename(source_path)), \
+                os.fdopen(handle, 'wb') as file:
+            file.write(header)
+            file.write(body)
+            for blob in blobs:
+                file.write(blob)
+            instrumentation.add_bytes('snapshot_written', file.tell())
+        os.chmod(temp_path, replacement_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path
+
+
+def _pause_gc():
+    global _gc_pauses, _gc_was_enabled
+    with _gc_lock:
+        if _gc_pauses == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+
+
+def _resume_gc():
+    global _gc_pauses
+    with _gc_lock:
+        _gc_pauses -= 1
+        if _gc_pauses == 0 and _gc_was_enabled:
+            gc.enable()
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of one snapshot file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                raise SnapshotError(f"{path} is truncated")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self._views = []
+        try:
+            self._parse(path, size)
+        except BaseException:
+            self.close()
+            raise
+
+    def _parse(self, path, size):
+        (magic, format_version, marshal_version, self.source_size, self.source_mtime_ns,
+         self.source_crc, count, body_crc, self._records_crc, meta_length) = HEADER.unpack_from(self._map)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} snapshot")
+        if marshal_version != marshal.version:
+            raise SnapshotError(f"{path} was written with marshal version {marshal_version}")
+        view = self._view = self._table(memoryview(self._map))
+        meta_end = HEADER.size + meta_length + _pad(meta_length)
+        tables_size = 24 * count + 8
+        body_end = meta_end + tables_size + _pad(tables_size)
+        if body_end > size:
+            raise SnapshotError(f"{path} is truncated")
+        with view[HEADER.size:body_end] as body:
+            if zlib.crc32(body) != body_crc:
+                raise SnapshotError(f"{path} has a corrupt header")
+        with view[HEADER.size:HEADER.size + meta_length] as meta:
+            self.records_key, self._mapping, self.meta = marshal.loads(meta)
+        position = meta_end
+        self._offsets = self._table(view[position:position + 8 * (count + 1)].cast('Q'))
+        position += 8 * (count + 1)
+        self._crcs = self._table(view[position:position + 4 * count].cast('I'))
+        position += 4 * count
+        self._keys = self._table(view[position:position + 8 * count].cast('q'))
+        position += 8 * count
+        self._order = self._table(view[position:position + 4 * count].cast('I'))
+        if self._offsets[count] > size:
+            raise SnapshotError(f"{path} is truncated")
+
+    def _table(self, view):
+        self._views.append(view)
+        return view
+
+    def __len__(self):
+        return len(self._crcs)
+
+    def matches(self, source_path):
+        """Whether the JSON file still holds what this snapshot was made from"""
+        try:
+            stat = os.stat(source_path)
+        except FileNotFoundError:
+            return False
+        if stat.st_size != self.source_size:
+            return False
+        if stat.st_mtime_ns == self.source_mtime_ns:
+            return True
+        # Same size but touched or copied: compare the contents once, and
+        # re-stamp the mtime when they match so later loads skip the CRC
+        with open(source_path, 'rb') as file:
+            if zlib.crc32(file.read()) != self.source_crc:
+                return False
+        self._restamp(stat.st_mtime_ns)
+        return True
+
+    def _restamp(self, mtime_ns):
+        try:
+            with open(self.path, 'r+b') as file:
+                file.seek(MTIME_OFFSET)
+                file.write(struct.pack('<q', mtime_ns))
+            self.source_mtime_ns = mtime_ns
+        except OSError:
+            pass
+
+    def record(self, number):
+        """Decode the record stored at position ``number``"""
+        # Released on the way out, even on errors, so the map can be closed
+        with self._view[self._offsets[number]:self._offsets[number + 1]] as blob:
+            if zlib.crc32(blob) != self._crcs[number]:
+                raise SnapshotError(f"Snapshot record {number} is corrupt")
+            return marshal.loads(blob)
+
+    def get(self, product_index, default=None):
+        """Return one product (or one product's supplier list) without decoding the rest"""
+        position = bisect_left(self._keys, product_index)
+        if position == len(self._keys) or self._keys[position] != product_index:
+            return default
+        # Duplicates sort by record number, so this is the first occurrence
+        record = self.record(self._order[position])
+        return record[1] if self._mapping else record
+
+    def document(self):
+        """Decode the whole document
+
+        Decoding creates millions of containers and no cycles, and the
+        collections they would trigger cost more than the decoding, so the
+        collector is paused meanwhile. The pause is reference counted under a
+        module lock because ``gc`` is process-wide: with threads decoding at
+        once, one finishing must not re-enable it under another, or leave it
+        off once everyone is done. Other threads run without collection for
+        that long too, which only delays their cycles
+        """
+        offsets = self._offsets.tolist()
+        # One checksum over all records instead of one per record
+        with self._view[offsets[0]:offsets[-1]] as region:
+            if zlib.crc32(region) != self._records_crc:
+                raise SnapshotError("Snapshot records are corrupt")
+            _pause_gc()
+            try:
+                records = [marshal.loads(region[start - offsets[0]:end - offsets[0]])
+                           for start, end in zip(offsets, offsets[1:])]
+            finally:
+                _resume_gc()
+        instrumentation.add_bytes('snapshot_read', len(self._map))
+        document = dict(self.meta)
+        document[self.records_key] = dict(records) if self._mapping else records
+        return document
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_snapshot(source_path):
+    """Return the snapshot of ``source_path`` if it exists and is current, else None"""
+    try:
+        snapshot = Snapshot(snapshot_path(source_path))
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if not snapshot.matches(source_path):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def is_current(source_path):
+    """Whether ``source_path`` has a usable, up-to-date snapshot"""
+    snapshot = open_snapshot(source_path)
+    if snapshot is None:
+        return False
+    snapshot.close()
+    return True
+
+
+def load_document(source_path):
+    """Return the document from a current snapshot of ``source_path``, or None"""
+    with instrumentation.span('snapshot.load', file=os.path.basename(source_path)):
+        snapshot = open_snapshot(source_path)
+        if snapshot is None:
+            return None
+        try:
+            with snapshot:
+                return snapshot.document()
+        except (ValueError, EOFError, TypeError):
+            return None
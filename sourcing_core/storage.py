@@ -0,0 +1,639 @@
+"""Pluggable storage for products, suppliers and quantity-price tiers.
+
+Two backends share the same interface:
+
+* ``JsonStorage`` keeps the original layout of ``final_sku.json`` and
+  ``sourcing_data.json`` and writes them atomically through the shared
+  writer queue in ``write_coordination``. A binary ``snapshot`` of each file
+  is kept next to it and read instead of the JSON while it is current.
+* ``SqliteStorage`` keeps the same records in an SQLite database running in
+  WAL mode, with indexed tables for products, categories, suppliers and price
+  tiers. Single inserts touch one row instead of rewriting a whole file, and
+  category filters, product lookups and export joins run as indexed queries.
+
+``get_storage()`` picks the backend from the ``SKU_STORAGE_BACKEND``
+environment variable (``json`` or ``sqlite``). Existing JSON data can be
+copied into a database once with ``python -m sourcing_core migrate``.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from . import instrumentation, snapshot
+from .data_cache import file_signature
+from .write_coordination import VersionConflict, document_version, get_writer
+
+SKU_FILE = 'final_sku.json'
+SOURCING_FILE = 'sourcing_data.json'
+DB_FILE = 'sourcing.db'
+
+PRODUCT_FIELDS = ('product_index', 'product_name', 'price_numeric', 'weight_quantity',
+                  'description', 'category_name')
+SUPPLIER_FIELDS = ('supplier_name', 'contact_info', 'delivery_time', 'moq', 'added_date')
+DEFAULT_CATEGORY = 'Uncategorized'
+# Documents JsonStorage loads whole from their snapshot rather than from JSON
+SNAPSHOT_LOADS = ('sourcing',)
+
+_TIER_MIN_QTY = re.compile(r'\d+')
+
+
+def parse_tier_min_qty(label):
+    """Return the minimum quantity of a tier label such as ``"10+"`` or ``"1-10"``"""
+    match = _TIER_MIN_QTY.search(str(label))
+    return int(match.group()) if match else None
+
+
+def _check_supplier(suppliers, position, supplier_name):
+    if position >= len(suppliers) or suppliers[position] != supplier_name:
+        raise VersionConflict(f"Supplier '{supplier_name}' moved or was removed since it was loaded")
+
+
+def _check_version(current, expected):
+    if expected is not None and current != expected:
+        raise VersionConflict(f"Data changed since it was loaded (version {expected}, now {current})")
+
+
+def iter_tier_rows(products_by_index, sourcing_data):
+    """Yield one flat row per (product, supplier, price tier) from in-memory records"""
+    for product_index, suppliers in sourcing_data.items():
+        product = products_by_index.get(int(product_index))
+        if not product:
+            continue
+        for supplier in suppliers:
+            for tier, price in supplier.get('quantity_pricing', {}).items():
+                yield {
+                    'product_index': product['product_index'],
+                    'product_name': product['product_name'],
+                    'category_name': product.get('category_name', DEFAULT_CATEGORY),
+                    'supplier_name': supplier.get('supplier_name', ''),
+                    'contact_info': supplier.get('contact_info', ''),
+                    'delivery_time': supplier.get('delivery_time', ''),
+                    'moq': supplier.get('moq', ''),
+                    'tier': tier,
+                    'price': price,
+                }
+
+
+class Storage:
+    """Interface shared by the storage backends
+
+    Subclasses implement loading and saving; the query helpers below fall
+    back to scanning the loaded records and are overridden where a backend
+    can answer them more cheaply.
+    """
+
+    def load_versioned(self, dataset):
+        """Return (records, version) for ``'products'`` or ``'sourcing'``
+
+        Passing that version as ``expected_version`` to ``save_products`` or
+        ``save_sourcing`` makes the save fail with ``VersionConflict`` if
+        anyone wrote the dataset in between.
+        """
+        raise NotImplementedError
+
+    def load_products(self):
+        raise NotImplementedError
+
+    def save_products(self, products, expected_version=None):
+        raise NotImplementedError
+
+    def add_product(self, product):
+        raise NotImplementedError
+
+    def load_sourcing(self):
+        raise NotImplementedError
+
+    def save_sourcing(self, sourcing_data, expected_version=None):
+        raise NotImplementedError
+
+    def add_supplier(self, product_index, supplier):
+        """Add one supplier; returns its position in the product's supplier list"""
+        raise NotImplementedError
+
+    def add_suppliers(self, batch):
+        """Add many (product_index, supplier) pairs in a single write
+
+        Returns the position of each new supplier in its product's list.
+        """
+        raise NotImplementedError
+
+    def update_pricing(self, product_index, position, supplier_name, pricing):
+        """Replace the ``quantity_pricing`` of the product's ``position``-th supplier
+
+        Raises ``VersionConflict`` if that supplier is no longer
+        ``supplier_name``, i.e. the list changed since it was loaded.
+        """
+        raise NotImplementedError
+
+    def version(self, dataset):
+        """Return a value that changes whenever ``'products'`` or ``'sourcing'`` is written"""
+        raise NotImplementedError
+
+    def get_product(self, product_index):
+        """Return one product by index, or None"""
+        return next((p for p in self.load_products() if p['product_index'] == product_index), None)
+
+    def categories(self):
+        """Return the sorted list of category names"""
+        return sorted(set(p.get('category_name', DEFAULT_CATEGORY) for p in self.load_products()))
+
+    def products_in_category(self, category):
+        """Return the products of one category"""
+        return [p for p in self.load_products() if p.get('category_name', DEFAULT_CATEGORY) == category]
+
+    def suppliers_for(self, product_index):
+        """Return the supplier records of one product"""
+        return self.load_sourcing().get(str(product_index), [])
+
+    def iter_tier_rows(self):
+        """Yield one flat row per (product, supplier, price tier)"""
+        products = {}
+        for product in self.load_products():
+            products.setdefault(product['product_index'], product)
+        return iter_tier_rows(products, self.load_sourcing())
+
+
+class JsonStorage(Storage):
+    """Storage backed by the original pretty-printed JSON files
+
+    Every write goes through the process-wide writer queue: mutations are
+    applied to the current file contents under a file lock and written back
+    atomically, so concurrent sessions merge their changes instead of
+    overwriting each other. ``sourcing_data.json`` is kept as
+    ``{"metadata": {...}, "sourcing": {...}}`` so it carries a version stamp;
+    the older plain ``{product_index: [suppliers]}`` layout is still read.
+    """
+
+    def __init__(self, sku_path=SKU_FILE, sourcing_path=SOURCING_FILE, snapshots=snapshot.ENABLED):
+        self.sku_path = sku_path
+        self.sourcing_path = sourcing_path
+        self.snapshots = snapshots
+
+    def _read_document(self, path, records_key, span):
+        """Load a document from its snapshot when current, else from JSON (refreshing the snapshot)
+
+        Products are always parsed from JSON, which decodes as fast as the
+        snapshot; their snapshot only serves ``get_product``.
+        """
+        full_load = self.snapshots and records_key in SNAPSHOT_LOADS
+        if full_load:
+            document = snapshot.load_document(path)
+            if document is not None:
+                return document
+        with instrumentation.span(span), open(path, 'rb') as file:
+            data = file.read()
+            stat = os.fstat(file.fileno())
+            instrumentation.add_bytes('json_read', len(data))
+            document = json.loads(data)
+        if records_key == 'sourcing' and set(document) != {'metadata', 'sourcing'}:
+            document = {"metadata": {}, "sourcing": document}
+        if full_load or (self.snapshots and not snapshot.is_current(path)):
+            self._write_snapshot(path, document, records_key, data, stat)
+        return document
+
+    @staticmethod
+    def _write_snapshot(path, document, records_key, data=None, stat=None):
+        # The snapshot only speeds up reads, so failing to write one is not an error
+        try:
+            if data is None:
+                with open(path, 'rb') as file:
+                    data = file.read()
+                    stat = os.fstat(file.fileno())
+            snapshot.write_snapshot(path, document, records_key, data, stat)
+        except (OSError, ValueError, TypeError, KeyError):
+            pass
+
+    def _read_products_document(self, path):
+        return self._read_document(path, 'products', 'storage.read_products')
+
+    def _read_sourcing_document(self, path):
+        if not os.path.exists(path):
+            return {"metadata": {}, "sourcing": {}}
+        return self._read_document(path, 'sourcing', 'storage.read_sourcing')
+
+    def _write(self, path, mutate, load):
+        records_key = 'products' if path == self.sku_path else 'sourcing'
+        written = None
+        if self.snapshots:
+            written = lambda path, document: self._write_snapshot(path, document, records_key)
+        with instrumentation.span('storage.write', file=os.path.basename(path)):
+            return get_writer().submit(path, mutate, load, written).result()
+
+    def _lookup(self, path, product_index):
+        """Look one record up in a current snapshot; returns (found, record)"""
+        if not self.snapshots:
+            return False, None
+        with instrumentation.span('snapshot.get'):
+            current = snapshot.open_snapshot(path)
+            if current is None:
+                return False, None
+            try:
+                with current:
+                    return True, current.get(int(product_index))
+            except (ValueError, EOFError, TypeError):
+                return False, None
+
+    def load_versioned(self, dataset):
+        if dataset == 'products':
+            document = self._read_products_document(self.sku_path)
+            return document['products'], document_version(document)
+        document = self._read_sourcing_document(self.sourcing_path)
+        return document['sourcing'], document_version(document)
+
+    def load_products(self):
+        return self._read_products_document(self.sku_path)['products']
+
+    def save_products(self, products, expected_version=None):
+        def replace(document):
+            _check_version(document_version(document), expected_version)
+            document['products'] = products
+            document['metadata']['total_products'] = len(products)
+        return self._write(self.sku_path, replace, self._read_products_document)
+
+    def add_product(self, product):
+        def append(document):
+            document['products'].append(product)
+            document['metadata']['total_products'] = len(document['products'])
+        return self._write(self.sku_path, append, self._read_products_document)
+
+    def load_sourcing(self):
+        return self._read_sourcing_document(self.sourcing_path)['sourcing']
+
+    def save_sourcing(self, sourcing_data, expected_version=None):
+        def replace(document):
+            _check_version(document_version(document), expected_version)
+            document['sourcing'] = sourcing_data
+        return self._write(self.sourcing_path, replace, self._read_sourcing_document)
+
+    def add_supplier(self, product_index, supplier):
+        return self.add_suppliers([(product_index, supplier)])[0]
+
+    def add_suppliers(self, batch):
+        positions = []
+
+        def append(document):
+            for product_index, supplier in batch:
+                suppliers = document['sourcing'].setdefault(str(product_index), [])
+                positions.append(len(suppliers))
+                suppliers.append(supplier)
+        self._write(self.sourcing_path, append, self._read_sourcing_document)
+        return positions
+
+    def update_pricing(self, product_index, position, supplier_name, pricing):
+        def update(document):
+            suppliers = document['sourcing'].get(str(product_index), [])
+            _check_supplier([s.get('supplier_name', '') for s in suppliers], position, supplier_name)
+            suppliers[position]['quantity_pricing'] = pricing
+        return self._write(self.sourcing_path, update, self._read_sourcing_document)
+
+    def get_product(self, product_index):
+        found, product = self._lookup(self.sku_path, product_index)
+        return product if found else super().get_product(product_index)
+
+    def suppliers_for(self, product_index):
+        found, suppliers = self._lookup(self.sourcing_path, product_index)
+        return (suppliers or []) if found else super().suppliers_for(product_index)
+
+    def version(self, dataset):
+        return file_signature(self.sku_path if dataset == 'products' else self.sourcing_path)
+
+
+# Prices have no declared type: NUMERIC or REAL affinity would store 1.0 as
+# 1 (or 1 as 1.0), and records would no longer round-trip unchanged
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    product_index INTEGER NOT NULL,
+    product_name TEXT NOT NULL,
+    price_numeric,
+    weight_quantity TEXT,
+    description TEXT,
+    category_id INTEGER REFERENCES categories(id),
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_index ON products(product_index);
+CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
+CREATE INDEX IF NOT EXISTS idx_products_name ON products(product_name);
+CREATE TABLE IF NOT EXISTS suppliers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_index INTEGER NOT NULL,
+    supplier_name TEXT NOT NULL,
+    contact_info TEXT,
+    delivery_time INTEGER,
+    moq INTEGER,
+    added_date TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_suppliers_product ON suppliers(product_index);
+CREATE INDEX IF NOT EXISTS idx_suppliers_name ON suppliers(supplier_name);
+CREATE TABLE IF NOT EXISTS price_tiers (
+    supplier_id INTEGER NOT NULL REFERENCES suppliers(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tier_label TEXT NOT NULL,
+    min_qty INTEGER,
+    price,
+    PRIMARY KEY (supplier_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_price_tiers_min_qty ON price_tiers(min_qty);
+CREATE TABLE IF NOT EXISTS meta (
+    dataset TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SqliteStorage(Storage):
+    """Storage backed by an SQLite database in WAL mode
+
+    Each thread (Streamlit runs every session in its own thread) gets its own
+    connection. Fields outside the known columns are kept in an ``extra``
+    JSON column so records round-trip unchanged. ``product_index`` is not
+    unique in the existing catalog, so products keep a separate row id that
+    preserves file order. Every write bumps a per-dataset counter in the
+    ``meta`` table inside the same transaction.
+    """
+
+    def __init__(self, db_path=DB_FILE):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def _bump_version(self, conn, dataset):
+        conn.execute(
+            'INSERT INTO meta (dataset, version) VALUES (?, 1) '
+            'ON CONFLICT(dataset) DO UPDATE SET version = version + 1',
+            (dataset,)
+        )
+
+    def _data_version(self, conn, dataset):
+        row = conn.execute('SELECT version FROM meta WHERE dataset = ?', (dataset,)).fetchone()
+        return row[0] if row else 0
+
+    def _begin_replace(self, conn, dataset, expected_version):
+        # Take the write lock before checking so nobody commits in between
+        conn.execute('BEGIN IMMEDIATE')
+        _check_version(self._data_version(conn, dataset), expected_version)
+
+    def version(self, dataset):
+        return (self.db_path, dataset, self._data_version(self._connect(), dataset))
+
+    def load_versioned(self, dataset):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            records = self.load_products() if dataset == 'products' else self.load_sourcing()
+            return records, self._data_version(conn, dataset)
+
+    # Products
+
+    def _category_id(self, conn, name):
+        conn.execute('INSERT OR IGNORE INTO categories (name) VALUES (?)', (name,))
+        return conn.execute('SELECT id FROM categories WHERE name = ?', (name,)).fetchone()[0]
+
+    def _insert_product(self, conn, product):
+        extra = {k: v for k, v in product.items() if k not in PRODUCT_FIELDS}
+        category = product.get('category_name')
+        conn.execute(
+            'INSERT INTO products (product_index, product_name, price_numeric, '
+            'weight_quantity, description, category_id, extra) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (product['product_index'], product['product_name'], product.get('price_numeric'),
+             product.get('weight_quantity'), product.get('description'),
+             self._category_id(conn, category) if category is not None else None,
+             json.dumps(extra, ensure_ascii=False) if extra else None)
+        )
+
+    @staticmethod
+    def _product_from_row(row):
+        product = {'product_index': row['product_index'], 'product_name': row['product_name']}
+        for field in ('price_numeric', 'weight_quantity', 'description'):
+            if row[field] is not None:
+                product[field] = row[field]
+        if row['category_name'] is not None:
+            product['category_name'] = row['category_name']
+        if row['extra']:
+            product.update(json.loads(row['extra']))
+        return product
+
+    _PRODUCT_SELECT = (
+        'SELECT p.product_index, p.product_name, p.price_numeric, p.weight_quantity, '
+        'p.description, c.name AS category_name, p.extra '
+        'FROM products p LEFT JOIN categories c ON c.id = p.category_id'
+    )
+
+    def load_products(self):
+        with instrumentation.span('storage.read_products'):
+            rows = self._connect().execute(self._PRODUCT_SELECT + ' ORDER BY p.id')
+            return [self._product_from_row(row) for row in rows]
+
+    def save_products(self, products, expected_version=None):
+        conn = self._connect()
+        with conn:
+            self._begin_replace(conn, 'products', expected_version)
+            conn.execute('DELETE FROM products')
+            for product in products:
+                self._insert_product(conn, product)
+            self._bump_version(conn, 'products')
+
+    def add_product(self, product):
+        conn = self._connect()
+        with conn:
+            self._insert_product(conn, product)
+            self._bump_version(conn, 'products')
+
+    def get_product(self, product_index):
+        row = self._connect().execute(
+            self._PRODUCT_SELECT + ' WHERE p.product_index = ? ORDER BY p.id LIMIT 1', (product_index,)
+        ).fetchone()
+        return self._product_from_row(row) if row else None
+
+    def categories(self):
+        conn = self._connect()
+        names = {row[0] for row in conn.execute(
+            'SELECT name FROM categories WHERE id IN (SELECT DISTINCT category_id FROM products)'
+        )}
+        if conn.execute('SELECT 1 FROM products WHERE category_id IS NULL LIMIT 1').fetchone():
+            names.add(DEFAULT_CATEGORY)
+        return sorted(names)
+
+    def products_in_category(self, category):
+        where = ' WHERE c.name = ?'
+        if category == DEFAULT_CATEGORY:
+            where += ' OR p.category_id IS NULL'
+        rows = self._connect().execute(self._PRODUCT_SELECT + where + ' ORDER BY p.id', (category,))
+        return [self._product_from_row(row) for row in rows]
+
+    # Suppliers and price tiers
+
+    def _insert_supplier(self, conn, product_index, supplier):
+        extra = {k: v for k, v in supplier.items()
+                 if k not in SUPPLIER_FIELDS and k != 'quantity_pricing'}
+        cursor = conn.execute(
+            'INSERT INTO suppliers (product_index, supplier_name, contact_info, delivery_time, '
+            'moq, added_date, extra) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (int(product_index), supplier.get('supplier_name', ''), supplier.get('contact_info'),
+             supplier.get('delivery_time'), supplier.get('moq'), supplier.get('added_date'),
+             json.dumps(extra, ensure_ascii=False) if extra else None)
+        )
+        self._insert_tiers(conn, cursor.lastrowid, supplier.get('quantity_pricing', {}))
+        return cursor.lastrowid
+
+    @staticmethod
+    def _position(conn, product_index, supplier_id):
+        """Position of a supplier row in its product's list, which is in id order"""
+        return conn.execute('SELECT COUNT(*) FROM suppliers WHERE product_index = ? AND id < ?',
+                            (int(product_index), supplier_id)).fetchone()[0]
+
+    def _insert_tiers(self, conn, supplier_id, pricing):
+        conn.executemany(
+            'INSERT INTO price_tiers (supplier_id, position, tier_label, min_qty, price) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(supplier_id, position, label, parse_tier_min_qty(label), price)
+             for position, (label, price) in enumerate(pricing.items())]
+        )
+
+    def _suppliers(self, where='', params=()):
+        conn = self._connect()
+        suppliers = {}
+        order = []
+        for row in conn.execute(f'SELECT * FROM suppliers {where} ORDER BY id', params):
+            supplier = {'supplier_name': row['supplier_name']}
+            for field in ('contact_info', 'delivery_time', 'moq'):
+                if row[field] is not None:
+                    supplier[field] = row[field]
+            supplier['quantity_pricing'] = {}
+            if row['added_date'] is not None:
+                supplier['added_date'] = row['added_date']
+            if row['extra']:
+                supplier.update(json.loads(row['extra']))
+            suppliers[row['id']] = supplier
+            order.append((row['product_index'], row['id']))
+        tier_where = f'WHERE supplier_id IN (SELECT id FROM suppliers {where})' if where else ''
+        for row in conn.execute(
+            f'SELECT supplier_id, tier_label, price FROM price_tiers {tier_where} '
+            'ORDER BY supplier_id, position', params
+        ):
+            suppliers[row['supplier_id']]['quantity_pricing'][row['tier_label']] = row['price']
+        return order, suppliers
+
+    def load_sourcing(self):
+        with instrumentation.span('storage.read_sourcing'):
+            order, suppliers = self._suppliers()
+        sourcing_data = {}
+        for product_index, supplier_id in order:
+            sourcing_data.setdefault(str(product_index), []).append(suppliers[supplier_id])
+        return sourcing_data
+
+    def save_sourcing(self, sourcing_data, expected_version=None):
+        conn = self._connect()
+        with conn:
+            self._begin_replace(conn, 'sourcing', expected_version)
+            conn.execute('DELETE FROM price_tiers')
+            conn.execute('DELETE FROM suppliers')
+            for product_index, suppliers in sourcing_data.items():
+                for supplier in suppliers:
+                    self._insert_supplier(conn, product_index, supplier)
+            self._bump_version(conn, 'sourcing')
+
+    def add_supplier(self, product_index, supplier):
+        return self.add_suppliers([(product_index, supplier)])[0]
+
+    def add_suppliers(self, batch):
+        conn = self._connect()
+        with conn:
+            positions = [self._position(conn, product_index, self._insert_supplier(conn, product_index, supplier))
+                         for product_index, supplier in batch]
+            self._bump_version(conn, 'sourcing')
+        return positions
+
+    def update_pricing(self, product_index, position, supplier_name, pricing):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('SELECT id, supplier_name FROM suppliers WHERE product_index = ? ORDER BY id',
+                                (int(product_index),)).fetchall()
+            _check_supplier([row['supplier_name'] for row in rows], position, supplier_name)
+            supplier_id = rows[position]['id']
+            conn.execute('DELETE FROM price_tiers WHERE supplier_id = ?', (supplier_id,))
+            self._insert_tiers(conn, supplier_id, pricing)
+            self._bump_version(conn, 'sourcing')
+
+    def suppliers_for(self, product_index):
+        order, suppliers = self._suppliers('WHERE product_index = ?', (int(product_index),))
+        return [suppliers[supplier_id] for _, supplier_id in order]
+
+    def iter_tier_rows(self):
+        cursor = self._connect().execute(
+            'SELECT p.product_index, p.product_name, COALESCE(c.name, ?) AS category_name, '
+            "s.supplier_name, COALESCE(s.contact_info, '') AS contact_info, "
+            "COALESCE(s.delivery_time, '') AS delivery_time, COALESCE(s.moq, '') AS moq, "
+            't.tier_label AS tier, t.price '
+            'FROM price_tiers t '
+            'JOIN suppliers s ON s.id = t.supplier_id '
+            'JOIN products p ON p.id = '
+            '(SELECT MIN(id) FROM products WHERE product_index = s.product_index) '
+            'LEFT JOIN categories c ON c.id = p.category_id '
+            'ORDER BY p.product_index, s.id, t.position', (DEFAULT_CATEGORY,)
+        )
+        for row in cursor:
+            yield dict(row)
+
+
+_instances = {}
+
+
+def get_storage(backend=None):
+    """Return the process-wide storage instance for the configured backend"""
+    backend = backend or os.environ.get('SKU_STORAGE_BACKEND', 'json')
+    if backend not in _instances:
+        if backend == 'sqlite':
+            _instances[backend] = SqliteStorage(os.environ.get('SKU_DB_PATH', DB_FILE))
+        elif backend == 'json':
+            _instances[backend] = JsonStorage()
+        else:
+            raise ValueError(f"Unknown storage backend: {backend}")
+    return _instances[backend]
+
+
+def migrate_json_to_sqlite(db_path=DB_FILE, sku_path=SKU_FILE, sourcing_path=SOURCING_FILE):
+    """Copy the JSON catalog and sourcing map into an SQLite database
+
+    Returns the number of products and suppliers written. Existing rows in
+    the database are replaced. Raises ValueError when the data read back
+    from the database differs from the JSON files.
+    """
+    source = JsonStorage(sku_path, sourcing_path)
+    target = SqliteStorage(db_path)
+    products = source.load_products()
+    sourcing_data = source.load_sourcing()
+    target.save_products(products)
+    target.save_sourcing(sourcing_data)
+    _check_round_trip('products', products, target.load_products())
+    _check_round_trip('sourcing', sourcing_data, target.load_sourcing())
+    return len(products), sum(len(suppliers) for suppliers in sourcing_data.values())
+
+
+def _check_round_trip(dataset, expected, actual):
+    # Compared as JSON so 1 and 1.0 (equal in Python) count as different
+    if json.dumps(expected, sort_keys=True) != json.dumps(actual, sort_keys=True):
+        raise ValueError(f"{dataset} did not round-trip through SQLite; "
+                         f"migrate into a new database file")
+
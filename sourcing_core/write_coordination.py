@@ -0,0 +1,189 @@
+"""Write coordination for JSON data files shared by several sessions.
+
+Three pieces keep concurrent edits from corrupting data or losing updates:
+
+* ``atomic_write_json`` writes to a temporary file in the same directory,
+  fsyncs it and renames it over the target, so readers and crashes only
+  ever see the old or the new file, never a truncated one.
+* ``file_lock`` takes an exclusive advisory lock on a ``.lock`` file next
+  to the target, serialising writers across processes.
+* ``WriterQueue`` runs every mutation of a file on one writer thread per
+  process. A mutation is a function that edits the freshly loaded document
+  in place; queued mutations for the same file are applied together under
+  one lock, one read and one atomic write, so concurrent edits merge instead
+  of overwriting each other.
+
+Every write stamps ``metadata.version`` with an increasing counter. Callers
+that replace a whole document can pass the version they read and get a
+``VersionConflict`` if someone else wrote in between.
+"""
+
+import json
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+
+from . import instrumentation
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Read once at import: os.umask can only be read by setting it, which is
+# not safe once other threads may be creating files
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class VersionConflict(Exception):
+    """The document changed since the caller read it"""
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive cross-process lock for ``path``"""
+    with open(path + '.lock', 'a+') as handle:
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def replacement_mode(path):
+    """Permission bits for a file about to replace ``path``
+
+    ``mkstemp`` creates files readable by their owner only; the replacement
+    keeps the target's mode, or gets the umask default for a new file.
+    """
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_json(path, data, indent=2):
+    """Write JSON to ``path`` via a temporary file and an atomic rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=indent, ensure_ascii=False)
+            instrumentation.add_bytes('json_written', file.tell())
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, replacement_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def document_version(document):
+    """Return the version stamp of a loaded document"""
+    return document.get('metadata', {}).get('version', 0)
+
+
+def _stamp(document):
+    metadata = document.setdefault('metadata', {})
+    metadata['version'] = metadata.get('version', 0) + 1
+    metadata['updated_timestamp'] = datetime.now().isoformat()
+
+
+class WriterQueue:
+    """Single writer thread that applies queued mutations to JSON documents"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='json-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, path, mutate, load, written=None):
+        """Queue ``mutate(document)`` for the file at ``path``; returns a Future
+
+        ``load(path)`` reads the current document. ``mutate`` edits it in
+        place and may raise (for example ``VersionConflict``) to reject
+        just its own change. ``written(path, document)``, if given, is
+        called under the lock after the file was replaced, to refresh files
+        derived from it; it must not raise.
+        """
+        future = Future()
+        self._queue.put((path, mutate, load, future, written))
+        self._ensure_started()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Merge everything already waiting so one write covers it
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            by_path = {}
+            for task in batch:
+                by_path.setdefault(task[0], []).append(task)
+            for path, tasks in by_path.items():
+                self._apply(path, tasks)
+
+    def _apply(self, path, tasks):
+        try:
+            with file_lock(path):
+                document = tasks[0][2](path)
+                applied = []
+                for _, mutate, _, future, _ in tasks:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        mutate(document)
+                        applied.append(future)
+                    except Exception as e:
+                        future.set_exception(e)
+                if applied:
+                    _stamp(document)
+                    atomic_write_json(path, document)
+                    written = next((task[4] for task in tasks if task[4] is not None), None)
+                    if written is not None:
+                        written(path, document)
+            for future in applied:
+                future.set_result(document_version(document))
+        except Exception as e:
+            for _, _, _, future, _ in tasks:
+                if not future.done():
+                    future.set_exception(e)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide writer queue"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriterQueue()
+        return _writer